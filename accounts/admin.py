@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import AccountDeletionRequest, RevokedToken, ShardAssignment, User
 
 
 @admin.register(User)
@@ -13,4 +13,29 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
         ('Additional Info', {'fields': ('created_at', 'updated_at')}),
     )
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'revoked_at', 'expires_at')
+    search_fields = ('jti',)
+    ordering = ('-revoked_at',)
+    readonly_fields = ('revoked_at',)
+
+
+
+@admin.register(AccountDeletionRequest)
+class AccountDeletionRequestAdmin(admin.ModelAdmin):
+    list_display = ('user_id', 'requested_at', 'completed_at', 'deleted_rows')
+    list_filter = ('completed_at',)
+    ordering = ('-requested_at',)
+    readonly_fields = ('requested_at', 'completed_at', 'deleted_rows')
+
+
+@admin.register(ShardAssignment)
+class ShardAssignmentAdmin(admin.ModelAdmin):
+    list_display = ('user', 'alias', 'moving', 'assigned_at')
+    list_filter = ('alias', 'moving')
+    # Changing the alias here would not move the data; use rebalance_shards
+    readonly_fields = ('user', 'alias', 'moving', 'assigned_at')
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'accounts'
\ No newline at end of file
+    name = 'accounts'
+
+    def ready(self):
+        from budget_tracker.db import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
+
+        from .authentication import invalidate_cached_user
+        from .models import User
+        post_save.connect(invalidate_cached_user, sender=User)
+        post_delete.connect(invalidate_cached_user, sender=User)
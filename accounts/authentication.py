@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+from copy import copy
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .tokens import USER_CLAIMS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _generation_key(user_id):
+    return f'auth:user:{user_id}:generation'
+
+
+class UserCache:
+    """Bounded, thread-safe LRU cache of user records with a per-entry TTL.
+
+    Entries live in the process. Each one remembers the user's generation in
+    the Django cache as it was before the user was loaded; ``invalidate``
+    replaces the generation, so with a shared ``CACHE_BACKEND`` every worker
+    drops its copy on the next hit instead of when the TTL runs out.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation(self, user_id):
+        """The user's current generation; read it before loading the user to ``set``"""
+        return cache.get(_generation_key(user_id))
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires, generation = entry
+            if expires <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        if generation != self.generation(user_id):
+            # Saved since it was loaded, possibly by another process
+            with self._lock:
+                self._entries.pop(user_id, None)
+            return None
+        # Each request gets its own instance, so changes to it never leak
+        return copy(user)
+
+    def set(self, user_id, user, generation):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (copy(user), time.monotonic() + self.ttl, generation)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        cache.set(_generation_key(user_id), uuid4().hex, timeout=None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop a saved or deleted user, e.g. after a profile update, deactivation or password change.
+
+    Done again on commit, since another worker may have cached the old row meanwhile.
+    """
+    user_id = instance.pk
+    user_cache.invalidate(user_id)
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that keeps recently seen users in ``user_cache``.
+
+    With ``AUTH_STATELESS_READS`` enabled, safe requests skip the lookup
+    altogether and use a user built from the token's profile claims; views
+    that need the full record set ``stateless_user = False``. Such users are
+    only as fresh as the token, so deactivation takes effect when it expires.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if self.allows_stateless_user(request, validated_token):
+            return self.get_token_user(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+    def allows_stateless_user(self, request, validated_token):
+        if not settings.AUTH_STATELESS_READS or request.method not in SAFE_METHODS:
+            return False
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        if not getattr(view, 'stateless_user', True):
+            return False
+        return all(claim in validated_token for claim in USER_CLAIMS)
+
+    def get_token_user(self, validated_token):
+        """Build an unsaved-looking ``User`` from token claims.
+
+        Unlike simplejwt's ``TokenUser`` it is a real model instance, so it can
+        be used in queryset filters such as ``filter(user=request.user)``.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = self.user_model(
+            **{api_settings.USER_ID_FIELD: user_id},
+            **{claim: validated_token[claim] for claim in USER_CLAIMS},
+            is_active=True,
+        )
+        user._state.adding = False
+        return user
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            generation = user_cache.generation(user_id)
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user, generation)
+            return user
+
+        # Cached users passed the active check when stored; deactivating a
+        # user or changing their password saves them, which retires the entry
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return user
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from budget_tracker.sharding import user_shard
+from goals.models import GoalContribution, SavingsGoal
+from transactions.models import MonthlyRollup, Transaction
+
+from .models import AccountDeletionRequest, User
+
+PURGE_BATCH_SIZE = 1000
+
+
+def request_account_deletion(user):
+    """Deactivate ``user`` and queue their account for purging; returns the request"""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        deletion, _ = AccountDeletionRequest.objects.get_or_create(user_id=user.pk)
+    return deletion
+
+
+def _purge_steps():
+    """``(model, id query)`` pairs in dependency order; each query takes the user id"""
+    contributions = GoalContribution._meta.db_table
+    goals = SavingsGoal._meta.db_table
+    return [
+        (GoalContribution,
+         f'SELECT c.id FROM {contributions} c INNER JOIN {goals} g ON c.goal_id = g.id WHERE g.user_id = %s'),
+        (SavingsGoal, f'SELECT id FROM {goals} WHERE user_id = %s'),
+        (MonthlyRollup, f'SELECT id FROM {MonthlyRollup._meta.db_table} WHERE user_id = %s'),
+        (Transaction, f'SELECT id FROM {Transaction._meta.db_table} WHERE user_id = %s'),
+    ]
+
+
+def purge_account(deletion, batch_size=PURGE_BATCH_SIZE, pause=0):
+    """Delete a deactivated user's data in batches, then the user row itself.
+
+    Each batch is a raw ``DELETE ... WHERE id IN (SELECT ... LIMIT n)`` in its
+    own short transaction, so no id lists are loaded into Python and other
+    writers get the database between batches (after ``pause`` seconds).
+    Every step only deletes what is left, so an interrupted purge resumes
+    where it stopped when run again. Returns the number of rows deleted.
+    """
+    user_id = deletion.user_id
+    with user_shard(user_id):
+        deleted = 0
+        for model, select in _purge_steps():
+            alias = router.db_for_write(model)
+            table = connections[alias].ops.quote_name(model._meta.db_table)
+            while True:
+                with transaction.atomic(using=alias):
+                    with connections[alias].cursor() as cursor:
+                        cursor.execute(f'DELETE FROM {table} WHERE id IN ({select} LIMIT %s)', [user_id, batch_size])
+                        count = cursor.rowcount
+                    AccountDeletionRequest.objects.filter(pk=deletion.pk).update(deleted_rows=F('deleted_rows') + count)
+                deleted += count
+                if count < batch_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+
+    # Only small rows are left; the collector handles them with the user
+    with transaction.atomic():
+        User.objects.filter(pk=user_id).delete()
+        AccountDeletionRequest.objects.filter(pk=deletion.pk).update(completed_at=timezone.now())
+    return deleted
+
+
+def purge_pending_accounts(batch_size=PURGE_BATCH_SIZE, pause=0):
+    """Finish every pending account deletion; returns the number of accounts purged"""
+    pending = AccountDeletionRequest.objects.filter(completed_at__isnull=True).order_by('requested_at')
+    purged = 0
+    for deletion in pending:
+        purge_account(deletion, batch_size=batch_size, pause=pause)
+        purged += 1
+    return purged
+
+
+def purge_account_in_background(deletion):
+    """Run ``purge_account`` in a daemon thread; the command picks up anything it leaves"""
+    def run():
+        try:
+            purge_account(deletion)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name=f'purge-user-{deletion.user_id}', daemon=True).start()
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class HashingSaturated(Exception):
+    """Raised when every worker is busy and the queue is full"""
+
+
+class HashingExecutor:
+    """Bounded thread pool for password hashing, with backpressure and metrics.
+
+    At most ``workers`` hashes run at once and ``queue_size`` more may wait;
+    beyond that ``run`` raises ``HashingSaturated`` instead of queueing, so a
+    login spike is turned away rather than starving other requests.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._hash_seconds = 0.0
+        self._max_hash_seconds = 0.0
+
+    async def run(self, func, *args):
+        self._admit()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, func, args)
+        finally:
+            self._release()
+
+    def run_sync(self, func, *args):
+        """``run`` for synchronous views; blocks the calling thread until the hash is done"""
+        self._admit()
+        try:
+            return self._executor.submit(self._timed, func, args).result()
+        finally:
+            self._release()
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise HashingSaturated
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _timed(self, func, args):
+        with self._lock:
+            self._running += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._hash_seconds += elapsed
+                self._max_hash_seconds = max(self._max_hash_seconds, elapsed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'running': self._running,
+                'queued': self._in_flight - self._running,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'hash_seconds_total': round(self._hash_seconds, 6),
+                'hash_seconds_max': round(self._max_hash_seconds, 6),
+                'hash_seconds_avg': round(self._hash_seconds / self._completed, 6) if self._completed else 0.0,
+            }
+
+
+def check_password_for_upgrade(password, encoded):
+    """``(valid, new_encoded)``: like ``check_password``, plus a fresh hash when ``encoded`` is outdated.
+
+    ``new_encoded`` is ``None`` unless the password is valid and its hash uses
+    an older hasher or fewer iterations than the current settings. The caller
+    saves it, as ``User.check_password``'s setter would.
+    """
+    upgraded = []
+    valid = check_password(password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return valid, upgraded[0] if upgraded else None
+
+
+password_hasher = HashingExecutor(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE)
+
+
+def check_user_password(user, password):
+    """Check ``user``'s password in ``password_hasher`` from a synchronous view.
+
+    An outdated hash is replaced and saved, as ``User.check_password`` does.
+    Raises ``HashingSaturated`` when the pool is full.
+    """
+    valid, upgraded = password_hasher.run_sync(check_password_for_upgrade, password, user.password)
+    if upgraded:
+        user.password = upgraded
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounts.deletion import PURGE_BATCH_SIZE, purge_pending_accounts
+
+
+class Command(BaseCommand):
+    help = 'Purge the data of accounts whose deletion was requested, resuming interrupted purges'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help='Number of rows deleted per transaction',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to wait between batches so other writers get the database',
+        )
+
+    def handle(self, *args, **options):
+        purged = purge_pending_accounts(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} deleted accounts'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.revocation import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired anyway'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_tokens()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired token revocations'))
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.rebalancing import REBALANCE_BATCH_SIZE, move_user, pin_users, rebalance
+
+
+class Command(BaseCommand):
+    help = (
+        'Move users\' transactions and goals between shards. Run with --pin before '
+        'changing SHARD_DB_NAMES, then without arguments to move pinned users to '
+        'their placement on the new shards; --user/--to moves individual users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pin', action='store_true',
+            help='Assign every unassigned user to the shard they are on now',
+        )
+        parser.add_argument(
+            '--user', dest='user_ids', type=int, action='append',
+            help='Move this user id (may be repeated); requires --to',
+        )
+        parser.add_argument('--to', help='Shard alias to move the --user ids to')
+        parser.add_argument(
+            '--limit', type=int,
+            help='Move at most this many pinned users',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=REBALANCE_BATCH_SIZE,
+            help='Number of rows copied per query',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.SHARD_DATABASES:
+            raise CommandError('Sharding is not enabled; set SHARD_DB_NAMES')
+        batch_size = options['batch_size']
+
+        if options['pin']:
+            pinned = pin_users(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Pinned {pinned} users to their current shard'))
+            return
+
+        if options['user_ids']:
+            target = options['to']
+            if target not in settings.SHARD_DATABASES:
+                raise CommandError(f"--to must be one of {', '.join(settings.SHARD_DATABASES)}")
+            for user_id in options['user_ids']:
+                moved = move_user(user_id, target, batch_size=batch_size)
+                self.stdout.write(f'Moved {moved} rows of user {user_id} to {target}')
+            return
+
+        users, rows = rebalance(limit=options['limit'], batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Moved {users} users ({rows} rows) to their hash placement'))
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from budget_tracker.replicas import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto the read replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep copying every this many seconds instead of copying once',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASE:
+            raise CommandError('No read replica is configured; set REPLICA_DB_NAME')
+        source = settings.DATABASES['default']['NAME']
+        target = settings.DATABASES[settings.REPLICA_DATABASE]['NAME']
+
+        while True:
+            started = time.monotonic()
+            copy_database(source, target)
+            self.stdout.write(self.style.SUCCESS(
+                f'Copied {source} to {target} in {time.monotonic() - started:.2f}s'
+            ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('transactions', models.PositiveBigIntegerField(default=0)),
+                ('goals', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletionRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.PositiveBigIntegerField(unique=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('deleted_rows', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_accountdeletionrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardAssignment',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shard_assignment', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('alias', models.CharField(max_length=100)),
+                ('assigned_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_shardassignment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shardassignment',
+            name='moving',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,14 @@
+class OwnerNameContextMixin:
+    """Pass the requesting user's full name to the serializer context.
+
+    Every object these views return belongs to ``request.user``, so the
+    serializer can take the owner name from the context instead of lazily
+    loading the related user for each row.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            context['owner_name'] = user.full_name
+        return context
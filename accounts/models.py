@@ -57,3 +57,68 @@ class User(AbstractUser):
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
+
+
+class DataVersion(models.Model):
+    """Per-user counters bumped on every write to the user's transactions or goals.
+
+    Read endpoints derive their ETags from these counters, so unchanged data
+    can be answered with ``304 Not Modified`` before any aggregation runs.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    transactions = models.PositiveBigIntegerField(default=0)
+    goals = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} - transactions v{self.transactions} - goals v{self.goals}"
+
+
+class RevokedToken(models.Model):
+    """A refresh token that may no longer be used, identified by its JTI.
+
+    Rows are only needed until the token would have expired anyway; the
+    in-memory set in ``accounts.revocation`` is kept in sync from them.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (expires {self.expires_at:%Y-%m-%d %H:%M})"
+
+
+class AccountDeletionRequest(models.Model):
+    """A pending or finished account deletion.
+
+    The user is deactivated when the request is made; their data is then
+    purged in batches by ``accounts.deletion``. The user id is stored as a
+    plain integer so the record outlives the user row.
+    """
+
+    user_id = models.PositiveBigIntegerField(unique=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    deleted_rows = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        state = 'completed' if self.completed_at else 'pending'
+        return f"Deletion of user {self.user_id} ({state})"
+
+
+class ShardAssignment(models.Model):
+    """Pins a user's transactions and goals to a shard other than their hash placement.
+
+    Written by the ``rebalance_shards`` command; see ``budget_tracker.sharding``.
+    While ``moving`` is set the rows are being copied off ``alias`` and API
+    requests may not change them.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='shard_assignment')
+    alias = models.CharField(max_length=100)
+    moving = models.BooleanField(default=False)
+    assigned_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.alias}"
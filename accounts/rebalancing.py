@@ -0,0 +1,154 @@
+from itertools import islice
+
+from django.db import transaction
+
+from accounts.versioning import GOALS, TRANSACTIONS, bump_data_version, get_data_versions
+from budget_tracker.sharding import hash_shard, shard_for_user
+from goals.models import GoalContribution, SavingsGoal
+from transactions.models import MonthlyRollup, Transaction
+
+from .models import ShardAssignment, User
+
+REBALANCE_BATCH_SIZE = 1000
+
+
+def _copy_rows(queryset, target, batch_size, **remap):
+    """Insert copies of ``queryset``'s rows on ``target`` under new ids.
+
+    ``remap`` maps a foreign key attname to ``{old id: new id}``. Returns the
+    ``{old id: new id}`` mapping of the copied rows.
+    """
+    model = queryset.model
+    timestamps = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    ids = {}
+    rows = queryset.order_by('pk').iterator(chunk_size=batch_size)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        old_ids = [row.pk for row in batch]
+        stamps = [[getattr(row, name) for name in timestamps] for row in batch]
+        for row in batch:
+            row.pk = None
+            for attname, mapping in remap.items():
+                setattr(row, attname, mapping[getattr(row, attname)])
+        model.objects.using(target).bulk_create(batch)
+        if timestamps:
+            # bulk_create stamps auto_now fields with the current time; keep the originals
+            for row, values in zip(batch, stamps):
+                for name, value in zip(timestamps, values):
+                    setattr(row, name, value)
+            model.objects.using(target).bulk_update(batch, timestamps)
+        ids.update(zip(old_ids, (row.pk for row in batch)))
+    return ids
+
+
+def _user_rows(alias, user_id):
+    """The user's querysets on ``alias``, children before parents"""
+    return [
+        GoalContribution.objects.using(alias).filter(goal__user_id=user_id),
+        SavingsGoal.objects.using(alias).filter(user_id=user_id),
+        MonthlyRollup.objects.using(alias).filter(user_id=user_id),
+        Transaction.objects.using(alias).filter(user_id=user_id),
+    ]
+
+
+def move_user(user_id, target, batch_size=REBALANCE_BATCH_SIZE):
+    """Move a user's transactions and goals to the shard ``target``; returns the rows moved.
+
+    The user is marked as moving first, so API requests can still read their
+    rows but not change them. Rows are copied under new ids in one transaction
+    on ``target``, then the user is assigned there and the originals are
+    deleted. Leftovers of an interrupted move are cleared from ``target``
+    first, so a failed move can simply be retried; if the process dies before
+    that, the user's writes are refused until the move is retried.
+    """
+    source = shard_for_user(user_id)
+    if source == target:
+        ShardAssignment.objects.filter(user_id=user_id, moving=True).update(moving=False)
+        return 0
+
+    _, created = ShardAssignment.objects.update_or_create(
+        user_id=user_id, defaults={'alias': source, 'moving': True}
+    )
+    try:
+        while True:
+            versions = get_data_versions(user_id, (TRANSACTIONS, GOALS))
+            moved = _copy_user(user_id, source, target, batch_size)
+            # Requests already under way when the move began may have written meanwhile
+            if get_data_versions(user_id, (TRANSACTIONS, GOALS)) == versions:
+                break
+    except Exception:
+        if created:
+            ShardAssignment.objects.filter(user_id=user_id).delete()
+        else:
+            ShardAssignment.objects.filter(user_id=user_id).update(moving=False)
+        raise
+
+    with transaction.atomic():
+        if target == hash_shard(user_id):
+            ShardAssignment.objects.filter(user_id=user_id).delete()
+        else:
+            ShardAssignment.objects.update_or_create(user_id=user_id, defaults={'alias': target, 'moving': False})
+        # Ids changed, so every cached figure and ETag of the user is stale
+        bump_data_version(user_id, TRANSACTIONS)
+        bump_data_version(user_id, GOALS)
+
+    with transaction.atomic(using=source):
+        for queryset in _user_rows(source, user_id):
+            queryset.delete()
+    return moved
+
+
+def _copy_user(user_id, source, target, batch_size):
+    """Replace the user's rows on ``target`` with copies of those on ``source``; returns the rows copied"""
+    with transaction.atomic(using=target):
+        for queryset in _user_rows(target, user_id):
+            queryset.delete()
+        copied = len(_copy_rows(Transaction.objects.using(source).filter(user_id=user_id), target, batch_size))
+        copied += len(_copy_rows(MonthlyRollup.objects.using(source).filter(user_id=user_id), target, batch_size))
+        goal_ids = _copy_rows(SavingsGoal.objects.using(source).filter(user_id=user_id), target, batch_size)
+        copied += len(goal_ids)
+        copied += len(_copy_rows(
+            GoalContribution.objects.using(source).filter(goal__user_id=user_id),
+            target, batch_size, goal_id=goal_ids,
+        ))
+    return copied
+
+
+def pin_users(batch_size=REBALANCE_BATCH_SIZE):
+    """Assign every unassigned user to their current hash placement; returns the users pinned.
+
+    Run before changing ``SHARD_DB_NAMES``, since that changes hash placements.
+    """
+    unassigned = User.objects.filter(shard_assignment__isnull=True).order_by('pk').values_list('pk', flat=True)
+    pinned = 0
+    while True:
+        user_ids = list(unassigned[:batch_size])
+        if not user_ids:
+            break
+        ShardAssignment.objects.bulk_create([
+            ShardAssignment(user_id=user_id, alias=hash_shard(user_id)) for user_id in user_ids
+        ])
+        pinned += len(user_ids)
+    return pinned
+
+
+def rebalance(limit=None, batch_size=REBALANCE_BATCH_SIZE):
+    """Move pinned users to their hash placement; returns ``(users moved, rows moved)``"""
+    users = rows = 0
+    settled = []
+    # Moves delete assignments, so read them all before starting
+    assignments = list(ShardAssignment.objects.order_by('pk').values_list('user_id', 'alias'))
+    for user_id, alias in assignments:
+        if alias == hash_shard(user_id):
+            settled.append(user_id)
+        elif limit is None or users < limit:
+            rows += move_user(user_id, hash_shard(user_id), batch_size=batch_size)
+            users += 1
+    # Pins that match the hash placement are no longer needed
+    ShardAssignment.objects.filter(user_id__in=settled).delete()
+    return users, rows
@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+
+class RevocationSet:
+    """In-process set of revoked refresh-token JTIs, kept in sync with ``RevokedToken``.
+
+    Membership checks are dictionary lookups. At most every ``sync_interval``
+    seconds the set pulls rows revoked since its last sync (re-reading an
+    overlap window, so rows from transactions that committed late are not
+    missed) and drops entries whose tokens have expired.
+    """
+
+    def __init__(self, sync_interval, overlap):
+        self.sync_interval = sync_interval
+        self.overlap = overlap
+        self._expiry = {}
+        self._synced_at = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        self._maybe_sync()
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > timezone.now()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+            self._synced_at = None
+            self._next_sync = 0.0
+
+    def _maybe_sync(self):
+        if time.monotonic() < self._next_sync:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            now = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=now)
+            if self._synced_at is not None:
+                rows = rows.filter(revoked_at__gte=self._synced_at - self.overlap)
+            for jti, expires_at in rows.values_list('jti', 'expires_at').iterator():
+                self._expiry[jti] = expires_at
+            self._expiry = {jti: expires_at for jti, expires_at in self._expiry.items() if expires_at > now}
+            self._synced_at = now
+            self._next_sync = time.monotonic() + self.sync_interval
+
+
+revoked_tokens = RevocationSet(
+    settings.TOKEN_REVOCATION_SYNC_INTERVAL,
+    timedelta(seconds=settings.TOKEN_REVOCATION_SYNC_OVERLAP),
+)
+
+
+def revoke_token(token):
+    """Revoke a refresh token; returns ``False`` if it had already been revoked.
+
+    The unique JTI makes the insert the authoritative check, so two requests
+    racing to rotate the same token cannot both succeed.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    finally:
+        revoked_tokens.add(jti, expires_at)
+    return True
+
+
+def purge_expired_tokens():
+    """Delete revocations of tokens that have expired by now; returns the number deleted"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
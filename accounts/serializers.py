@@ -53,8 +53,8 @@
 #         read_only_fields = ('id', 'username', 'created_at')
 
 from rest_framework import serializers
-from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from budget_tracker.metrics import ProfiledSerializerMixin
 from .models import User
 from django.contrib.auth.models import AnonymousUser
 
@@ -74,35 +74,27 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
+        password_hash = validated_data.pop('password_hash', None)
+        if password_hash is None:
+            return User.objects.create_user(**validated_data)
+
+        # The password was already hashed off the request thread (accounts.hashing)
+        validated_data.pop('password')
+        user = User(**validated_data)
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        user.password = password_hash
+        user.save()
         return user
 
 
-class UserLoginSerializer(serializers.Serializer):
+class UserCredentialsSerializer(serializers.Serializer):
+    """Validates the login fields only; the password itself is checked by the caller"""
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
-    def validate(self, attrs):
-        email = attrs.get('email')
-        password = attrs.get('password')
-
-        if not email or not password:
-            raise serializers.ValidationError('Must include email and password')
-
-        # Authenticate using email as username (because USERNAME_FIELD = 'email')
-        user = authenticate(username=email, password=password)
-
-        if user is None:
-            raise serializers.ValidationError('Invalid credentials')
-
-        if not user.is_active:
-            raise serializers.ValidationError('User account is disabled')
-
-        attrs['user'] = user
-        return attrs
-
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
 
     class Meta:
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import update_last_login
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .hashing import HashingSaturated, check_user_password, password_hasher
+from .revocation import revoke_token, revoked_tokens
+
+# Profile claims carried by every token, enough to stand in for the user
+# record on read-only requests (see accounts.authentication)
+USER_CLAIMS = ('email', 'username', 'first_name', 'last_name', 'is_staff')
+
+
+class UserRefreshToken(RefreshToken):
+    """Refresh token carrying the user's profile claims; access tokens inherit them"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair for valid credentials; the password is checked in the bounded hashing pool"""
+    token_class = UserRefreshToken
+
+    def validate(self, attrs):
+        user = get_user_model().objects.filter(**{self.username_field: attrs[self.username_field]}).first()
+        try:
+            if user is None:
+                # Hash anyway so response times do not reveal which emails exist
+                password_hasher.run_sync(make_password, attrs['password'])
+                valid = False
+            else:
+                valid = check_user_password(user, attrs['password'])
+        except HashingSaturated:
+            raise Throttled(wait=1, detail='Too many concurrent sign-ins, please retry shortly.')
+
+        self.user = user if valid else None
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        refresh = self.get_token(self.user)
+        data = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return data
+
+
+class RevokingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer that rejects revoked tokens and revokes rotated ones.
+
+    Stands in for simplejwt's blacklist app: the check is an in-memory
+    lookup, and rotation costs one insert instead of blacklist joins.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revoked_tokens.is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise InvalidToken(_('Token is revoked'))
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revoke_token(refresh):
+                # Another request rotated this token first
+                raise InvalidToken(_('Token is revoked'))
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data['refresh'] = str(refresh)
+
+        return data
@@ -0,0 +1,111 @@
+import hashlib
+from functools import partial, wraps
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import DataVersion
+
+TRANSACTIONS = 'transactions'
+GOALS = 'goals'
+
+
+def bump_data_version(user_id, scope, using=None):
+    """Increment the user's data version for ``scope`` (``transactions`` or ``goals``).
+
+    ``using`` is the database holding the changed rows. When that is a shard
+    rather than the database of the versions, the bump waits for the shard's
+    transaction to commit, so no reader pairs the new version with old data.
+    """
+    if using is not None and using != router.db_for_write(DataVersion):
+        transaction.on_commit(partial(bump_data_version, user_id, scope), using=using)
+        return
+
+    versions = DataVersion.objects.filter(user_id=user_id)
+    if versions.update(**{scope: F(scope) + 1}):
+        return
+    try:
+        with transaction.atomic(using=versions.db):
+            DataVersion.objects.create(user_id=user_id, **{scope: 1})
+    except IntegrityError:
+        # Created concurrently since the update above
+        versions.update(**{scope: F(scope) + 1})
+
+
+def get_data_versions(user_id, scopes):
+    """Return the user's current versions for ``scopes`` as a tuple, in one query"""
+    versions = DataVersion.objects.filter(user_id=user_id).values_list(*scopes).first()
+    return versions or (0,) * len(scopes)
+
+
+def request_data_version(request, scope):
+    """The user's version for ``scope``, reusing the one read for the request's ETag"""
+    versions = getattr(request, '_data_versions', {})
+    if scope not in versions:
+        return get_data_versions(request.user.pk, (scope,))[0]
+    return versions[scope]
+
+
+def data_version_etag(request, scopes):
+    """Build a strong ETag for a read of ``request`` over the given data scopes.
+
+    The ETag covers the full URL (filters, cursors, host in pagination links),
+    today's date, since some responses default to the current month, and the
+    user's name, which responses show as ``user_name``.
+    """
+    versions = get_data_versions(request.user.pk, scopes)
+    request._data_versions = dict(zip(scopes, versions))
+    key = '|'.join([
+        request.build_absolute_uri(),
+        str(request.user.pk),
+        request.user.full_name,
+        timezone.localdate().isoformat(),
+        *(f'{scope}={version}' for scope, version in zip(scopes, versions)),
+    ])
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def conditional_on_data_version(request, scopes, get_response):
+    """Answer ``If-None-Match`` with 304 when the user's data has not changed.
+
+    The version is read before ``get_response`` runs, so a write racing with
+    the read can only make the ETag stale-looking, never wrongly fresh.
+    """
+    if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+        return get_response()
+
+    etag = data_version_etag(request, scopes)
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    response = get_response()
+    if response.status_code == status.HTTP_200_OK:
+        response['ETag'] = etag
+    return response
+
+
+def etag_on_data_version(*scopes):
+    """Decorator adding data-version ETags to a DRF function view"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            return conditional_on_data_version(
+                request, scopes, lambda: view_func(request, *args, **kwargs)
+            )
+        return wrapped_view
+    return decorator
+
+
+class DataVersionETagMixin:
+    """Add data-version ETags to the GET handler of a generic view"""
+    etag_scopes = ()
+
+    def get(self, request, *args, **kwargs):
+        return conditional_on_data_version(
+            request, self.etag_scopes, lambda: super(DataVersionETagMixin, self).get(request, *args, **kwargs)
+        )
@@ -56,12 +56,23 @@
 
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import HttpResponseNotAllowed
+import json
 from .models import User
-from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer
+from .serializers import UserRegistrationSerializer, UserCredentialsSerializer, UserProfileSerializer
+from .hashing import HashingSaturated, check_password_for_upgrade, password_hasher
+from .deletion import purge_account_in_background, request_account_deletion
+from .revocation import revoke_token
+from django.conf import settings
+from django.db import transaction
+from .tokens import UserRefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.exceptions import NotAuthenticated
@@ -72,56 +83,157 @@ from drf_yasg import openapi
 
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def register(request):
-    """Register a new user"""
-    serializer = UserRegistrationSerializer(data=request.data)
-    if serializer.is_valid():
+def _request_data(request):
+    """Parse a JSON or form-encoded body of a plain Django request"""
+    if request.content_type == 'application/json':
         try:
-            user = serializer.save()
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'message': 'User registered successfully',
-                'user': UserProfileSerializer(user).data,
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
-            }, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            return Response({"error": "Something went wrong during registration", "details": str(e)},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+    return request.POST.dict()
+
+
+def _render(data, status_code, headers=None):
+    """Render a DRF ``Response`` outside an ``APIView``, so ``response.data`` stays available"""
+    response = Response(data, status=status_code, headers=headers)
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = 'application/json'
+    response.renderer_context = {}
+    return response.render()
+
+
+def _saturated():
+    return _render(
+        {"error": "Too many concurrent sign-ins, please retry shortly"},
+        status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': '1'},
+    )
+
+
+def _tokens_response(message, user, status_code):
+    refresh = UserRefreshToken.for_user(user)
+    return _render({
+        'message': message,
+        'user': UserProfileSerializer(user).data,
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+    }, status_code)
+
+
+async def register(request):
+    """Register a new user; the password is hashed in the bounded hashing pool"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return _render({"error": "Invalid JSON body"}, status.HTTP_400_BAD_REQUEST)
+
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return _render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        password_hash = await password_hasher.run(make_password, serializer.validated_data['password'])
+    except HashingSaturated:
+        return _saturated()
+
+    try:
+        user = await sync_to_async(serializer.save)(password_hash=password_hash)
+        return _tokens_response('User registered successfully', user, status.HTTP_201_CREATED)
+    except Exception as e:
+        return _render({"error": "Something went wrong during registration", "details": str(e)},
+                       status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def login(request):
+    """Login user and return JWT tokens; the password is checked in the bounded hashing pool"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return _render({"error": "Invalid JSON body"}, status.HTTP_400_BAD_REQUEST)
+
+    serializer = UserCredentialsSerializer(data=data)
+    if not serializer.is_valid():
+        return _render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    email = serializer.validated_data['email']
+    password = serializer.validated_data['password']
+
+    user = await User.objects.filter(email=email).afirst()
+    try:
+        if user is None:
+            # Hash anyway so response times do not reveal which emails exist
+            await password_hasher.run(make_password, password)
+            valid = False
+        else:
+            valid, upgraded = await password_hasher.run(check_password_for_upgrade, password, user.password)
+    except HashingSaturated:
+        return _saturated()
+
+    if not valid or not user.is_active:
+        return _render({'non_field_errors': ['Invalid credentials']}, status.HTTP_400_BAD_REQUEST)
+    if upgraded:
+        # Outdated hasher or iteration count, saved as User.check_password would
+        user.password = upgraded
+        await sync_to_async(user.save)(update_fields=['password'])
+
+    try:
+        return _tokens_response('Login successful', user, status.HTTP_200_OK)
+    except Exception as e:
+        return _render({"error": "Login failed", "details": str(e)},
+                       status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# Django 4.2's csrf_exempt and require_POST decorators cannot wrap async views;
+# these endpoints authenticate with credentials in the body, not cookies
+register.csrf_exempt = True
+login.csrf_exempt = True
 
 
 @api_view(['POST'])
-@permission_classes([AllowAny])
-def login(request):
-    """Login user and return JWT tokens"""
-    serializer = UserLoginSerializer(data=request.data)
-    if serializer.is_valid():
-        try:
-            user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'message': 'Login successful',
-                'user': UserProfileSerializer(user).data,
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
-            }, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"error": "Login failed", "details": str(e)},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+@permission_classes([IsAuthenticated])
+def logout(request):
+    """Revoke the given refresh token so it can no longer be used"""
+    try:
+        refresh = UserRefreshToken(request.data.get('refresh'))
+    except TokenError as e:
+        return Response({"error": "Invalid refresh token", "details": str(e)},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if refresh.get(jwt_settings.USER_ID_CLAIM) != request.user.pk:
+        return Response({"error": "Invalid refresh token"}, status=status.HTTP_400_BAD_REQUEST)
+
+    revoke_token(refresh)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def delete_account(request):
+    """Deactivate the account now and purge its data in the background"""
+    try:
+        valid = password_hasher.run_sync(check_password, request.data.get('password') or '', request.user.password)
+    except HashingSaturated:
+        return Response({"error": "Too many concurrent password checks, please retry shortly"},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': '1'})
+    if not valid:
+        return Response({"error": "Password is incorrect"}, status=status.HTTP_400_BAD_REQUEST)
+
+    deletion = request_account_deletion(request.user)
+    if settings.ACCOUNT_PURGE_IN_BACKGROUND:
+        transaction.on_commit(lambda: purge_account_in_background(deletion))
+    return Response({
+        'message': 'Account deactivated; its data is being deleted',
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
     """Get and update user profile"""
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
+    # The profile shows fields that tokens do not carry
+    stateless_user = False
 
     # def get_object(self):
     #     user = self.request.user
@@ -0,0 +1,28 @@
+"""SQLite connection tuning applied through the ``connection_created`` signal."""
+
+# Tuned for many concurrent readers and short write bursts: WAL lets readers
+# run alongside the writer, NORMAL sync is durable in WAL mode except on power
+# loss, and busy_timeout makes writers wait for the lock instead of failing
+# with "database is locked".
+PRODUCTION_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # milliseconds
+    'cache_size': -65536,  # negative values are KiB, so 64 MiB
+    'mmap_size': 268435456,  # 256 MiB
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply the database's ``PRAGMAS`` setting to each new SQLite connection"""
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        apply_sqlite_pragmas(cursor, pragmas)
@@ -0,0 +1,251 @@
+"""Per-endpoint request profiling, exported in the Prometheus text format.
+
+``RequestMetricsMiddleware`` times every request, counts and times its
+database queries with ``execute_wrapper`` on every configured connection,
+times serialization (in serializers using ``ProfiledSerializerMixin``) and
+the rendering of DRF responses, and adds a ``Server-Timing`` header.
+Streaming responses are recorded once their body has been sent, and get no
+header since their figures are not known in time. Figures are kept per
+process in ``request_metrics``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRIC_PREFIX = 'budget_tracker'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# Timing of the request being served, for serializers that have no request at hand
+_current_timing = ContextVar('request_timing', default=None)
+# Set while a profiled serializer runs, so nested ones are not counted twice
+_serializing = ContextVar('serializing', default=False)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style; not thread-safe on its own"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """``(le, cumulative count)`` pairs, ending with ``+Inf``"""
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def format_metric(name, kind, help_text, samples):
+    """Format one metric family; ``samples`` are ``(suffix, labels, value)`` triples"""
+    name = f'{METRIC_PREFIX}_{name}'
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for suffix, labels, value in samples:
+        lines.append(f'{name}{suffix}{_labels(labels) if labels else ""} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _histogram_samples(histograms):
+    for labels, histogram in histograms:
+        for bound, count in histogram.samples():
+            yield '_bucket', dict(labels, le=bound), count
+        yield '_sum', labels, round(histogram.sum, 6)
+        yield '_count', labels, histogram.count
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.statuses = Counter()
+        self.latency = Histogram(SECONDS_BUCKETS)
+        self.db_time = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.serialize_time = Histogram(SECONDS_BUCKETS)
+        self.render_time = Histogram(SECONDS_BUCKETS)
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint request statistics for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, method, status, seconds, queries, db_seconds, serialize_seconds, render_seconds):
+        with self._lock:
+            stats = self._endpoints.get((endpoint, method))
+            if stats is None:
+                stats = self._endpoints[(endpoint, method)] = _EndpointStats()
+            stats.statuses[status] += 1
+            stats.latency.observe(seconds)
+            stats.db_time.observe(db_seconds)
+            stats.queries.observe(queries)
+            stats.serialize_time.observe(serialize_seconds)
+            stats.render_time.observe(render_seconds)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        """All figures in the Prometheus text exposition format"""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            keyed = [({'endpoint': endpoint, 'method': method}, stats) for (endpoint, method), stats in endpoints]
+            return ''.join([
+                format_metric('http_requests_total', 'counter', 'Requests served, by endpoint and status.', [
+                    ('', dict(labels, status=status), count)
+                    for labels, stats in keyed for status, count in sorted(stats.statuses.items())
+                ]),
+                format_metric('http_request_duration_seconds', 'histogram', 'Total request latency.',
+                              _histogram_samples((labels, stats.latency) for labels, stats in keyed)),
+                format_metric('db_queries_per_request', 'histogram', 'Database queries run per request.',
+                              _histogram_samples((labels, stats.queries) for labels, stats in keyed)),
+                format_metric('db_duration_seconds', 'histogram', 'Time per request spent in database queries.',
+                              _histogram_samples((labels, stats.db_time) for labels, stats in keyed)),
+                format_metric('serialize_duration_seconds', 'histogram',
+                              'Time per request spent in serializers turning objects into response data.',
+                              _histogram_samples((labels, stats.serialize_time) for labels, stats in keyed)),
+                format_metric('render_duration_seconds', 'histogram',
+                              'Time per request spent rendering response data to bytes.',
+                              _histogram_samples((labels, stats.render_time) for labels, stats in keyed)),
+            ])
+
+
+request_metrics = RequestMetrics()
+
+
+class _RequestTiming:
+    """Query count and timings of one request; also the ``execute_wrapper`` callable"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+@contextmanager
+def _counting_queries(timing):
+    """Route every connection's queries through ``timing`` inside the block"""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timing))
+        yield
+
+
+class ProfiledSerializerMixin:
+    """Add the time spent in ``to_representation`` to the current request's serialization time.
+
+    For ``many=True`` each item is timed as it is serialized.
+    """
+
+    def to_representation(self, instance):
+        timing = _current_timing.get()
+        if timing is None or _serializing.get():
+            return super().to_representation(instance)
+        token = _serializing.set(True)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timing.serialize_seconds += time.perf_counter() - started
+            _serializing.reset(token)
+
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    # URL names keep the label set small; unmatched paths share one label
+    return (match.view_name or match.route) if match else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """Record per-endpoint latency, database and rendering figures for every request"""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request._metrics_timing = _RequestTiming()
+        started = time.perf_counter()
+        token = _current_timing.set(timing)
+        try:
+            with _counting_queries(timing):
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+
+        if response.streaming:
+            # The body is generated, and queried for, after this returns
+            response.streaming_content = self._streamed(
+                response.streaming_content, request, response, timing, started
+            )
+            return response
+
+        seconds = time.perf_counter() - started
+        self._record(request, response, timing, seconds)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={timing.db_seconds * 1000:.2f};desc="{timing.queries} queries", '
+                f'serialize;dur={timing.serialize_seconds * 1000:.2f}, '
+                f'render;dur={timing.render_seconds * 1000:.2f}, '
+                f'total;dur={seconds * 1000:.2f}'
+            )
+        return response
+
+    def _streamed(self, content, request, response, timing, started):
+        try:
+            with _counting_queries(timing):
+                yield from content
+        finally:
+            self._record(request, response, timing, time.perf_counter() - started)
+
+    def _record(self, request, response, timing, seconds):
+        request_metrics.record(
+            _endpoint(request), request.method, response.status_code,
+            seconds, timing.queries, timing.db_seconds, timing.serialize_seconds, timing.render_seconds,
+        )
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_timing.render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,124 @@
+"""Read replica routing for read-only endpoints.
+
+Views opt in with ``replica_reads`` (function views) or a ``replica_reads = True``
+class attribute. Safe requests to those views read from ``REPLICA_DATABASE``;
+everything else, and every write, goes to the primary. A user who has just
+written is pinned to the primary for ``REPLICA_STICKY_SECONDS`` so they never
+read data older than their own change from a lagging replica.
+"""
+import sqlite3
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The request being served on this thread or task, if its view reads from the replica
+_replica_request = ContextVar('replica_request', default=None)
+
+
+def replica_reads(view):
+    """Mark a function view as safe to serve from the read replica"""
+    view.replica_reads = True
+    return view
+
+
+def copy_database(source, target):
+    """Copy the SQLite database file ``source`` over ``target`` with the online backup API.
+
+    The copy is a consistent snapshot; in WAL mode writers to ``source`` are
+    not blocked while it runs.
+    """
+    source_db = sqlite3.connect(source)
+    target_db = sqlite3.connect(target)
+    try:
+        source_db.backup(target_db)
+    finally:
+        target_db.close()
+        source_db.close()
+
+
+def _sticky_key(user_id):
+    return f'replica:sticky:{user_id}'
+
+
+def mark_primary_sticky(user_id):
+    """Pin the user's reads to the primary while the replica catches up"""
+    cache.set(_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_primary_sticky(user_id):
+    return cache.get(_sticky_key(user_id)) is not None
+
+
+def authenticated_user(request):
+    # DRF stores the authenticated user on the Django request. Until then the
+    # attribute is AuthenticationMiddleware's lazy session user, which must not
+    # be evaluated here: loading it would route its own query back to us.
+    user = request.__dict__.get('user')
+    if user is None or type(user) is SimpleLazyObject or not user.is_authenticated:
+        return None
+    return user
+
+
+def _view_reads_from_replica(view_func):
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return getattr(view_func, 'replica_reads', False) or getattr(view_class, 'replica_reads', False)
+
+
+class ReplicaRouter:
+    """Send reads of opted-in requests to the replica and all writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        request = _replica_request.get()
+        if request is None:
+            return None
+        alias = getattr(request, '_read_alias', None)
+        if alias is None:
+            user = authenticated_user(request)
+            if user is None:
+                # Authentication itself reads from the primary
+                return None
+            alias = DEFAULT_DB_ALIAS if is_primary_sticky(user.pk) else settings.REPLICA_DATABASE
+            request._read_alias = alias
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so rows from either may be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema with the data when it is synced
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Route reads of opted-in views to the replica and pin writers to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replica_request.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_request.reset(token)
+
+        if (settings.REPLICA_DATABASE and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            user = authenticated_user(request)
+            if user is not None:
+                mark_primary_sticky(user.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.REPLICA_DATABASE and request.method in SAFE_METHODS
+                and _view_reads_from_replica(view_func)):
+            _replica_request.set(request)
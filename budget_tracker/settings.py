@@ -1,6 +1,10 @@
 import os
 from pathlib import Path
 from datetime import timedelta
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
+
+from .db import PRODUCTION_SQLITE_PRAGMAS
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -35,12 +39,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'budget_tracker.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'budget_tracker.replicas.ReplicaMiddleware',
+    'budget_tracker.sharding.ShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,14 +71,109 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'budget_tracker.wsgi.application'
+ASGI_APPLICATION = 'budget_tracker.asgi.application'
 
 # Database
+# DB_PROFILE=production keeps connections open between requests and tunes
+# SQLite for concurrent readers and writers (WAL, busy timeout, larger caches;
+# see budget_tracker/db.py). Individual pragmas can be overridden below.
+DB_PROFILE = config('DB_PROFILE', default='development')
+SQLITE_PRAGMAS = {}
+if DB_PROFILE == 'production':
+    SQLITE_PRAGMAS = dict(
+        PRODUCTION_SQLITE_PRAGMAS,
+        busy_timeout=config('SQLITE_BUSY_TIMEOUT', default=PRODUCTION_SQLITE_PRAGMAS['busy_timeout'], cast=int),
+        cache_size=config('SQLITE_CACHE_SIZE', default=PRODUCTION_SQLITE_PRAGMAS['cache_size'], cast=int),
+        mmap_size=config('SQLITE_MMAP_SIZE', default=PRODUCTION_SQLITE_PRAGMAS['mmap_size'], cast=int),
+    )
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600 if DB_PROFILE == 'production' else 0, cast=int),
+        'CONN_HEALTH_CHECKS': DB_PROFILE == 'production',
+        'PRAGMAS': SQLITE_PRAGMAS,
+    }
+}
+
+# Read replica: a copy of the primary kept current by the sync_replica command.
+# When REPLICA_DB_NAME is set, summaries, stats and list/detail reads are served
+# from it; a user who has just written reads from the primary for
+# REPLICA_STICKY_SECONDS, which should exceed the sync interval.
+REPLICA_DB_NAME = config('REPLICA_DB_NAME', default='')
+REPLICA_DATABASE = 'replica' if REPLICA_DB_NAME else None
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=30, cast=int)
+if REPLICA_DATABASE:
+    DATABASES[REPLICA_DATABASE] = dict(
+        DATABASES['default'],
+        NAME=REPLICA_DB_NAME,
+        PRAGMAS=dict(SQLITE_PRAGMAS, query_only='ON'),
+        TEST={'MIRROR': 'default'},
+    )
+
+# Sharding: with SHARD_DB_NAMES set (comma-separated SQLite files), transactions
+# and goals are spread over the shard_0 ... shard_N databases by user; users and
+# tokens stay on the default database. Create the shards' tables with
+# "migrate --database shard_N --run-syncdb" and move users between them with
+# the rebalance_shards command. Sharded data is not served from the replica.
+SHARD_DB_NAMES = config('SHARD_DB_NAMES', default='', cast=Csv())
+SHARD_DATABASES = []
+for index, name in enumerate(SHARD_DB_NAMES):
+    alias = f'shard_{index}'
+    DATABASES[alias] = dict(DATABASES['default'], NAME=name)
+    SHARD_DATABASES.append(alias)
+
+DATABASE_ROUTERS = [
+    'budget_tracker.sharding.ShardRouter',
+    'budget_tracker.replicas.ReplicaRouter',
+]
+
+# Cache
+# CACHE_BACKEND selects the local-memory (default), file-based or Redis backend.
+# Local-memory and file caches are bounded by CACHE_MAX_ENTRIES and cull a third
+# of their entries when full; for Redis, bound the size on the server with
+# maxmemory and an allkeys-lru eviction policy.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'budget-tracker',
+    'file': str(BASE_DIR / 'cache'),
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default=CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': 'budget-tracker',
     }
 }
+if CACHE_BACKEND != 'redis':
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int),
+        'CULL_FREQUENCY': 3,
+    }
+# Writers are pinned to the primary through the cache, so every process must see it
+if REPLICA_DATABASE and CACHE_BACKEND == 'locmem':
+    raise ImproperlyConfigured('REPLICA_DB_NAME requires a shared cache: set CACHE_BACKEND to file or redis')
+
+# Savings goal contributions are appended to a ledger; once a goal has this many
+# pending entries they are compacted into its current amount once the request commits. The
+# compact_goal_contributions command does the same for all goals.
+GOAL_COMPACTION_THRESHOLD = config('GOAL_COMPACTION_THRESHOLD', default=50, cast=int)
+
+# Request profiling: per-endpoint latency, query, serialization and render
+# figures, served to admins at /api/_metrics/ in the Prometheus format. SERVER_TIMING also reports
+# each request's figures to the client in a Server-Timing header; it is off
+# unless DEBUG is, since timings tell any client about the server.
+REQUEST_METRICS = config('REQUEST_METRICS', default=True, cast=bool)
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,7 +207,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -117,6 +219,29 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Authenticated users are kept in a per-process LRU cache for AUTH_USER_CACHE_TTL
+# seconds. Saving a user retires every process's copy through a generation key in
+# the shared cache (only this process's with CACHE_BACKEND=locmem). AUTH_STATELESS_READS lets GET/HEAD/OPTIONS
+# requests use a user built from the token claims, with no database lookup.
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=1024, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+AUTH_STATELESS_READS = config('AUTH_STATELESS_READS', default=False, cast=bool)
+
+# Revoked refresh tokens are stored in the database and checked against an
+# in-process set that re-reads new revocations every SYNC_INTERVAL seconds.
+TOKEN_REVOCATION_SYNC_INTERVAL = config('TOKEN_REVOCATION_SYNC_INTERVAL', default=5, cast=int)
+TOKEN_REVOCATION_SYNC_OVERLAP = config('TOKEN_REVOCATION_SYNC_OVERLAP', default=60, cast=int)
+
+# Register, login, the token endpoint and account deletion hash passwords in a
+# bounded thread pool: at most PASSWORD_HASH_WORKERS hashes run at once and
+# PASSWORD_HASH_QUEUE_SIZE more may wait; further requests get 429 Too Many Requests.
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=4, cast=int)
+PASSWORD_HASH_QUEUE_SIZE = config('PASSWORD_HASH_QUEUE_SIZE', default=32, cast=int)
+
+# Deleted accounts are purged in a background thread right after the request;
+# purge_deleted_accounts finishes any purge that was interrupted.
+ACCOUNT_PURGE_IN_BACKGROUND = config('ACCOUNT_PURGE_IN_BACKGROUND', default=True, cast=bool)
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -142,6 +267,8 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
     'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.tokens.UserTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.RevokingTokenRefreshSerializer',
     
     'JTI_CLAIM': 'jti',
     
@@ -0,0 +1,163 @@
+"""Per-user sharding of the transactions and goals apps across ``SHARD_DATABASES``.
+
+Every row in these apps belongs to one user and no query crosses users, so a
+user's rows live together on one shard: the one pinned by their
+``ShardAssignment``, or else ``hash_shard(user_id)``. Users, tokens and data
+versions stay on the primary.
+
+The router needs to know whose data a query is for. During API requests that
+is the authenticated user; commands and background jobs select a shard with
+``user_shard(user_id)`` or ``using_shard(alias)``. With no shard selected,
+queries on sharded models raise ``ShardNotSelected`` instead of silently
+reading the wrong database. While a user is being moved between shards,
+requests may read their rows but writes raise ``UserBeingMoved``.
+"""
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .replicas import authenticated_user
+
+SHARDED_APPS = ('transactions', 'goals')
+
+# Shard explicitly selected by user_shard()/using_shard()
+_current_shard = ContextVar('current_shard', default=None)
+# The request being served, whose authenticated user selects the shard
+_current_request = ContextVar('shard_request', default=None)
+
+
+class ShardNotSelected(Exception):
+    """A sharded model was queried without a user or shard to route it to"""
+
+
+class UserBeingMoved(APIException):
+    """A request tried to change rows that are being copied to another shard"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved. Please try again shortly.'
+    default_code = 'user_being_moved'
+
+
+def sharding_enabled():
+    return bool(settings.SHARD_DATABASES)
+
+
+def data_aliases():
+    """Aliases holding transactions and goals: every shard, or just the primary"""
+    return list(settings.SHARD_DATABASES) or [DEFAULT_DB_ALIAS]
+
+
+def hash_shard(user_id, aliases=None):
+    """The shard a user lands on by default; CRC32 keeps it stable across processes"""
+    aliases = aliases or settings.SHARD_DATABASES
+    return aliases[zlib.crc32(str(user_id).encode()) % len(aliases)]
+
+
+def shard_placement(user_id):
+    """``(alias, moving)``: the shard holding ``user_id``'s rows and whether they are being moved off it"""
+    from accounts.models import ShardAssignment
+
+    placement = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id=user_id
+    ).values_list('alias', 'moving').first()
+    return placement or (hash_shard(user_id), False)
+
+
+def shard_for_user(user_id):
+    """The shard holding ``user_id``'s rows"""
+    return shard_placement(user_id)[0]
+
+
+@contextmanager
+def using_shard(alias):
+    """Route sharded models to ``alias`` inside the block"""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def user_shard(user_id):
+    """Route sharded models to ``user_id``'s shard inside the block"""
+    return using_shard(shard_for_user(user_id) if sharding_enabled() else DEFAULT_DB_ALIAS)
+
+
+def _request_shard(request):
+    alias = getattr(request, '_shard_alias', None)
+    if alias is None:
+        user = authenticated_user(request)
+        if user is None:
+            return None
+        alias, moving = shard_placement(user.pk)
+        request._shard_alias, request._shard_moving = alias, moving
+    return alias
+
+
+class ShardRouter:
+    """Send the sharded apps' models to the current user's shard"""
+
+    def _db_for(self, model, hints):
+        if not sharding_enabled():
+            return None
+        instance = hints.get('instance')
+        if model._meta.app_label not in SHARDED_APPS:
+            # Related users of sharded rows live on the primary, not with the row
+            if instance is not None and instance._state.db in settings.SHARD_DATABASES:
+                return DEFAULT_DB_ALIAS
+            return None
+
+        if instance is not None and instance._state.db in settings.SHARD_DATABASES:
+            return instance._state.db
+        alias = _current_shard.get()
+        if alias is None:
+            request = _current_request.get()
+            alias = request is not None and _request_shard(request)
+        if not alias and instance is not None:
+            if instance._meta.label == settings.AUTH_USER_MODEL:
+                # e.g. user.transactions, or assigning Transaction.user
+                alias = shard_for_user(instance.pk)
+            elif getattr(instance, 'user_id', None) is not None:
+                alias = shard_for_user(instance.user_id)
+        if not alias:
+            raise ShardNotSelected(
+                f'{model._meta.label} is sharded; query it during an authenticated '
+                f'request or inside user_shard()/using_shard()'
+            )
+        return alias
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        alias = self._db_for(model, hints)
+        if alias is not None and model._meta.app_label in SHARDED_APPS:
+            request = _current_request.get()
+            if request is not None and _request_shard(request) and request._shard_moving:
+                raise UserBeingMoved
+        return alias
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.SHARD_DATABASES:
+            return app_label in SHARDED_APPS
+        return None
+
+
+class ShardMiddleware:
+    """Make the request available to ``ShardRouter`` while it is served"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding_enabled():
+            return self.get_response(request)
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
@@ -4,6 +4,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from . import views
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Budget Tracker API",
@@ -22,6 +24,8 @@ urlpatterns = [
     path('api/', include('accounts.urls')),
     path('api/', include('transactions.urls')),
     path('api/', include('goals.urls')),
+    path('api/auth/hashing-stats/', views.hashing_stats, name='hashing_stats'),
+    path('api/_metrics/', views.metrics, name='metrics'),
     
     # Swagger documentation
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
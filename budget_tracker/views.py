@@ -0,0 +1,34 @@
+"""Operational endpoints for admins, served at the project level"""
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from accounts.hashing import password_hasher
+
+from .metrics import PROMETHEUS_CONTENT_TYPE, format_metric, request_metrics
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def hashing_stats(request):
+    """Queue depth and timing of the password hashing pool"""
+    return Response(password_hasher.stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Per-endpoint request metrics and hashing pool figures in the Prometheus text format"""
+    hashing = password_hasher.stats()
+    body = request_metrics.render() + ''.join(
+        format_metric(f'password_hash_{name}', 'gauge', f'Password hashing pool {name.replace("_", " ")}.',
+                      [('', None, hashing[name])])
+        for name in ('workers', 'queue_size', 'running', 'queued')
+    ) + ''.join(
+        format_metric(f'password_hash_{name}_total', 'counter', f'Password hashes {name}.',
+                      [('', None, hashing[name])])
+        for name in ('completed', 'rejected')
+    ) + format_metric('password_hash_seconds_total', 'counter', 'Time spent hashing passwords.',
+                      [('', None, hashing['hash_seconds_total'])])
+    return HttpResponse(body, content_type=PROMETHEUS_CONTENT_TYPE)
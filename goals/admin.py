@@ -1,25 +1,56 @@
 from django.contrib import admin
-from .models import SavingsGoal
+from .models import GoalContribution, SavingsGoal
+
+
+class CompletedListFilter(admin.SimpleListFilter):
+    """Filter on the saved amount, pending contributions included, rather than the stored flag"""
+    title = 'completed'
+    parameter_name = 'completed'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Yes'), ('no', 'No'))
+
+    def queryset(self, request, queryset):
+        if self.value() in ('yes', 'no'):
+            return queryset.completed(self.value() == 'yes')
+        return queryset
 
 
 @admin.register(SavingsGoal)
 class SavingsGoalAdmin(admin.ModelAdmin):
-    list_display = ('title', 'user', 'target_amount', 'current_amount', 'progress_percentage', 'is_completed', 'deadline', 'created_at')
-    list_filter = ('is_completed', 'created_at', 'deadline')
+    list_display = ('title', 'user', 'target_amount', 'saved_amount', 'progress_percentage', 'completed', 'deadline', 'created_at')
+    list_filter = (CompletedListFilter, 'created_at', 'deadline')
     search_fields = ('title', 'user__username', 'user__email')
     ordering = ('-created_at',)
-    readonly_fields = ('is_completed', 'progress_percentage', 'remaining_amount', 'created_at', 'updated_at')
+    # Amounts change through the ledger only; editing current_amount here would bypass it
+    readonly_fields = ('current_amount', 'saved_amount', 'completed', 'progress_percentage', 'remaining_amount', 'created_at', 'updated_at')
     
     fieldsets = (
         ('Goal Details', {
-            'fields': ('user', 'title', 'target_amount', 'current_amount', 'deadline')
+            'fields': ('user', 'title', 'target_amount', 'current_amount', 'saved_amount', 'deadline')
         }),
         ('Progress', {
-            'fields': ('is_completed', 'progress_percentage', 'remaining_amount'),
+            'fields': ('completed', 'progress_percentage', 'remaining_amount'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_balance()
+
+    @admin.display(boolean=True, description='Completed')
+    def completed(self, obj):
+        return obj.is_target_reached
+
+
+@admin.register(GoalContribution)
+class GoalContributionAdmin(admin.ModelAdmin):
+    list_display = ('goal', 'amount', 'source', 'is_applied', 'created_at')
+    list_filter = ('source', 'is_applied', 'created_at')
+    search_fields = ('goal__title', 'goal__user__email')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at',)
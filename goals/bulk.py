@@ -0,0 +1,107 @@
+from django.db import router, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .ledger import record_contributions
+from .models import GoalContribution, SavingsGoal, goals_changed
+from .serializers import SavingsGoalSerializer
+
+BULK_BATCH_SIZE = 500
+
+
+def _validate_rows(rows, partial=False):
+    """Validate goal rows with one reusable serializer.
+
+    Returns ``(validated, errors)``; ``errors`` lists ``{'row': index, 'errors': {...}}``.
+    """
+    validator = SavingsGoalSerializer(partial=partial)
+    validated = []
+    errors = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'errors': {'non_field_errors': ['Expected an object']}})
+            continue
+        try:
+            validated.append(validator.run_validation(row))
+        except serializers.ValidationError as exc:
+            errors.append({'row': index, 'errors': exc.detail})
+    return validated, errors
+
+
+def create_goals(user, rows):
+    """Create many goals for ``user`` with one ``bulk_create``.
+
+    Either every row is valid and created, or nothing is written and the
+    row errors are returned. Returns ``(goals, errors)``.
+    """
+    validated, errors = _validate_rows(rows)
+    if errors:
+        return [], errors
+
+    goals = [SavingsGoal(user=user, **data) for data in validated]
+    for goal in goals:
+        # bulk_create skips SavingsGoal.save, so apply its completion rule here
+        goal.is_completed = goal.current_amount >= goal.target_amount
+    with transaction.atomic(using=router.db_for_write(SavingsGoal)):
+        SavingsGoal.objects.bulk_create(goals, batch_size=BULK_BATCH_SIZE)
+        goals_changed(user.pk)
+    return goals, []
+
+
+def update_goals(user, rows):
+    """Patch many of ``user``'s goals with one ``bulk_update``.
+
+    Each row holds a goal ``id`` and any of ``title``, ``target_amount``,
+    ``deadline`` and ``current_amount``. New amounts are recorded as ledger
+    adjustments. Returns ``(goals, errors)``; nothing is written on errors.
+    """
+    validated, errors = _validate_rows(rows, partial=True)
+    ids = []
+    for index, row in enumerate(rows):
+        goal_id = row.get('id') if isinstance(row, dict) else None
+        if not isinstance(row, dict):
+            pass  # Already reported by _validate_rows
+        elif not isinstance(goal_id, int) or isinstance(goal_id, bool):
+            errors.append({'row': index, 'errors': {'id': ['A valid integer is required.']}})
+        elif goal_id in ids:
+            errors.append({'row': index, 'errors': {'id': ['Duplicate goal id.']}})
+        ids.append(goal_id)
+    if errors:
+        return [], sorted(errors, key=lambda error: error['row'])
+
+    goals = SavingsGoal.objects.filter(user=user, pk__in=ids).with_balance().in_bulk()
+    missing = [{'row': index, 'errors': {'id': ['Savings goal not found.']}}
+               for index, goal_id in enumerate(ids) if goal_id not in goals]
+    if missing:
+        return [], missing
+
+    fields = {'is_completed', 'updated_at'}
+    changed = []
+    adjustments = {}
+    now = timezone.now()
+    for goal_id, data in zip(ids, validated):
+        goal = goals[goal_id]
+        amount = data.pop('current_amount', None)
+        if amount is not None and amount != goal.saved_amount:
+            adjustments[goal_id] = amount - goal.saved_amount
+            goal.pending_amount = amount - goal.current_amount
+        if not data:
+            # Amount-only rows never write the goal row
+            continue
+        for attr, value in data.items():
+            setattr(goal, attr, value)
+        fields.update(data)
+        # bulk_update skips SavingsGoal.save, so apply its completion rule here
+        goal.is_completed = goal.is_target_reached
+        goal.updated_at = now
+        changed.append(goal)
+
+    with transaction.atomic(using=router.db_for_write(SavingsGoal)):
+        # current_amount is never written: only compaction moves it
+        if changed:
+            SavingsGoal.objects.bulk_update(changed, sorted(fields), batch_size=BULK_BATCH_SIZE)
+        if adjustments:
+            record_contributions(user.pk, adjustments, source=GoalContribution.ADJUSTMENT)
+        else:
+            goals_changed(user.pk)
+    return [goals[goal_id] for goal_id in ids], []
@@ -0,0 +1,5 @@
+"""Cache key of the goals summary, versioned like ``transactions.caching``"""
+
+
+def goals_summary_cache_key(user_id, version):
+    return f'goals:summary:{user_id}:{version}'
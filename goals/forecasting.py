@@ -0,0 +1,87 @@
+import math
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from transactions.models import MonthlyRollup
+
+CENTS = Decimal('0.01')
+DAYS_PER_MONTH = 365.25 / 12
+FORECAST_MONTHS = 6
+MAX_FORECAST_MONTHS = 36
+
+
+def _month_start(day, months_back=0):
+    """Return the first day of the month ``months_back`` months before ``day``"""
+    index = day.year * 12 + day.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def monthly_net_savings(user, months=FORECAST_MONTHS, today=None):
+    """Return the user's net savings for each of the last ``months`` complete months.
+
+    One grouped query over the monthly rollups; months without transactions
+    count as zero. Oldest month first.
+    """
+    today = today or timezone.localdate()
+    end = _month_start(today)
+    start = _month_start(today, months)
+    rows = MonthlyRollup.objects.filter(
+        user=user, month__gte=start, month__lt=end
+    ).values('month').annotate(
+        income=Sum('total', filter=Q(type='income')),
+        expense=Sum('total', filter=Q(type='expense')),
+    ).order_by()
+
+    net = {row['month']: (row['income'] or 0) - (row['expense'] or 0) for row in rows}
+    return [net.get(_month_start(today, back), Decimal('0.00')) for back in range(months, 0, -1)]
+
+
+def forecast_goals(goals, monthly_savings, today=None):
+    """Forecast when each ``with_balance`` goal reaches its target.
+
+    Assumes the average of ``monthly_savings`` keeps going towards each goal.
+    The average is computed once, so every goal costs a constant amount of
+    arithmetic regardless of how much history the user has.
+    """
+    today = today or timezone.localdate()
+    average = (sum(monthly_savings, Decimal('0.00')) / (len(monthly_savings) or 1)).quantize(CENTS)
+
+    forecasts = []
+    for goal in goals:
+        remaining = goal.remaining_amount
+        if remaining <= 0:
+            months_to_target = 0.0
+        elif average > 0:
+            months_to_target = float(remaining / average)
+        else:
+            months_to_target = None
+
+        projected = None
+        if months_to_target is not None:
+            projected = today + timedelta(days=math.ceil(months_to_target * DAYS_PER_MONTH))
+
+        required = None
+        at_risk = False
+        if goal.deadline is not None and remaining > 0:
+            months_left = (goal.deadline - today).days / DAYS_PER_MONTH
+            if months_left > 0:
+                required = (remaining / Decimal(str(months_left))).quantize(CENTS)
+            at_risk = projected is None or projected > goal.deadline
+
+        forecasts.append({
+            'goal_id': goal.pk,
+            'title': goal.title,
+            'target_amount': goal.target_amount,
+            'saved_amount': goal.saved_amount,
+            'remaining_amount': remaining,
+            'deadline': goal.deadline,
+            'average_monthly_savings': average,
+            'months_to_target': round(months_to_target, 1) if months_to_target is not None else None,
+            'projected_completion_date': projected,
+            'required_monthly_savings': required,
+            'deadline_at_risk': at_risk,
+        })
+    return forecasts
@@ -0,0 +1,97 @@
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count
+
+from .models import GoalContribution, SavingsGoal, goals_changed
+
+COMPACTION_BATCH_SIZE = 1000
+
+
+def record_contributions(user_id, amounts, source=GoalContribution.CONTRIBUTION):
+    """Append ``{goal_id: Decimal}`` entries to the ledger of the user's goals.
+
+    The goals must already be known to belong to ``user_id``. Goals whose
+    pending entries reach ``GOAL_COMPACTION_THRESHOLD`` are compacted once the
+    entries are committed; a failed compaction is logged and left for the next
+    run instead of failing the caller.
+    """
+    using = router.db_for_write(GoalContribution)
+    with transaction.atomic(using=using):
+        GoalContribution.objects.bulk_create([
+            GoalContribution(goal_id=goal_id, amount=amount, source=source)
+            for goal_id, amount in amounts.items()
+        ])
+        goals_changed(user_id)
+        transaction.on_commit(partial(_compact_crowded, list(amounts)), using=using, robust=True)
+
+
+def _compact_crowded(goal_ids):
+    threshold = settings.GOAL_COMPACTION_THRESHOLD
+    crowded = [
+        goal_id for goal_id, pending in GoalContribution.objects.filter(
+            goal_id__in=goal_ids, is_applied=False
+        ).values('goal').annotate(pending=Count('id')).values_list('goal', 'pending')
+        if pending >= threshold
+    ]
+    if crowded:
+        compact_contributions(goal_ids=crowded)
+
+
+def set_saved_amount(goal, amount):
+    """Record the adjustment that brings a ``with_balance`` goal to ``amount``.
+
+    The goal row itself is not written, so its ``current_amount`` stays
+    whatever compaction last left there.
+    """
+    delta = amount - goal.saved_amount
+    if delta:
+        record_contributions(goal.user_id, {goal.pk: delta}, source=GoalContribution.ADJUSTMENT)
+        goal.pending_amount = amount - goal.current_amount
+
+
+def compact_contributions(goal_ids=None, batch_size=COMPACTION_BATCH_SIZE):
+    """Fold pending ledger entries into ``current_amount``; returns the entries applied.
+
+    Entries are processed in id order, one batch per database transaction.
+    Each batch claims the entries it read by marking them applied where they
+    are still pending, and only adds them up once every one was claimed, so
+    concurrent runs never apply an entry twice and contributions inserted
+    meanwhile wait for the next run.
+    """
+    using = router.db_for_write(GoalContribution)
+    pending = GoalContribution.objects.using(using).filter(is_applied=False)
+    if goal_ids is not None:
+        pending = pending.filter(goal_id__in=list(goal_ids))
+
+    applied = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = _pending_batch(pending, batch_size)
+            if not batch:
+                break
+
+            claimed = GoalContribution.objects.using(using).filter(
+                id__in=[row[0] for row in batch], is_applied=False
+            ).update(is_applied=True)
+            if claimed != len(batch):
+                # Another run applied some of these entries first; read the batch again
+                transaction.set_rollback(True, using=using)
+                continue
+
+            totals = Counter()
+            for _, goal_id, amount in batch:
+                totals[goal_id] += amount
+            SavingsGoal.objects.using(using).add_amounts(dict(totals))
+        applied += len(batch)
+
+    return applied
+
+
+def _pending_batch(pending, batch_size):
+    """The next ``(id, goal_id, amount)`` rows to apply, skipping rows locked by another run"""
+    if connections[pending.db].features.has_select_for_update_skip_locked:
+        pending = pending.select_for_update(skip_locked=True)
+    return list(pending.order_by('id').values_list('id', 'goal_id', 'amount')[:batch_size])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from budget_tracker.sharding import data_aliases, using_shard
+from goals.ledger import COMPACTION_BATCH_SIZE, compact_contributions
+
+
+class Command(BaseCommand):
+    help = 'Fold pending goal contributions into the goals\' current amounts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--goal', dest='goal_ids', type=int, action='append',
+            help='Only compact contributions to this goal id (may be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=COMPACTION_BATCH_SIZE,
+            help='Number of contributions applied per transaction',
+        )
+
+    def handle(self, *args, **options):
+        applied = 0
+        for alias in data_aliases():
+            with using_shard(alias):
+                applied += compact_contributions(
+                    goal_ids=options['goal_ids'], batch_size=options['batch_size']
+                )
+        self.stdout.write(self.style.SUCCESS(f'Compacted {applied} goal contributions'))
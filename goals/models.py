@@ -1,13 +1,93 @@
-from django.db import models
+from django.db import models, router
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Least
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from accounts.versioning import GOALS, bump_data_version
+
 User = get_user_model()
 
 
+def goals_changed(user_id):
+    """Bump the user's goals data version, which also retires their cached goal figures"""
+    bump_data_version(user_id, GOALS, using=router.db_for_write(SavingsGoal))
+
+
+class SavingsGoalQuerySet(models.QuerySet):
+    def add_amounts(self, amounts):
+        """Atomically add ``{goal_id: Decimal}`` amounts to goals in a single UPDATE.
+
+        The increment happens in SQL, so concurrent contributions never lose
+        updates, and ``is_completed`` is recomputed in the same statement.
+        Returns the number of goals updated.
+        """
+        if not amounts:
+            return 0
+        delta = Case(
+            *(When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()),
+            default=Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        new_amount = F('current_amount') + delta
+        return self.filter(pk__in=list(amounts)).update(
+            current_amount=new_amount,
+            is_completed=Case(
+                When(GreaterThanOrEqual(new_amount, F('target_amount')), then=Value(True)),
+                default=Value(False),
+            ),
+            updated_at=timezone.now(),
+        )
+
+    def with_balance(self):
+        """Annotate ``pending_amount``, the sum of ledger entries not yet compacted.
+
+        ``SavingsGoal.saved_amount`` adds it to ``current_amount``; reads that
+        show or aggregate balances must go through this annotation.
+        """
+        pending = GoalContribution.objects.filter(
+            goal=OuterRef('pk'), is_applied=False
+        ).values('goal').annotate(total=Sum('amount')).values('total')
+        return self.annotate(pending_amount=Coalesce(
+            Subquery(pending),
+            Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ))
+
+    def completed(self, completed=True):
+        """Goals whose saved amount, pending contributions included, has (or has not) reached the target.
+
+        Must follow ``with_balance()``. Use this rather than the stored
+        ``is_completed``, which only changes when the goal row is written.
+        """
+        reached = GreaterThanOrEqual(F('current_amount') + F('pending_amount'), F('target_amount'))
+        return self.filter(reached) if completed else self.exclude(reached)
+
+    def with_progress(self):
+        """Annotate ``progress`` (percent of target, capped at 100) and ``remaining``.
+
+        Must follow ``with_balance()``; both figures use the saved amount so
+        goal lists can be sorted on them in SQL.
+        """
+        saved = F('current_amount') + F('pending_amount')
+        return self.annotate(
+            progress=Least(
+                Cast(saved, models.FloatField()) * 100.0 / Cast('target_amount', models.FloatField()),
+                Value(100.0),
+            ),
+            remaining=Greatest(
+                F('target_amount') - saved,
+                Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+
 class SavingsGoal(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='savings_goals')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='savings_goals', db_constraint=False)
     title = models.CharField(max_length=200)
     target_amount = models.DecimalField(
         max_digits=10, 
@@ -23,26 +103,39 @@ class SavingsGoal(models.Model):
     deadline = models.DateField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # As of the last write to the row; contributions pending in the ledger are
+    # not reflected, so reads use saved_amount or SavingsGoalQuerySet.completed()
     is_completed = models.BooleanField(default=False)
 
+    objects = SavingsGoalQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'is_completed']),
+            models.Index(fields=['user', 'deadline']),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
 
+    @property
+    def saved_amount(self):
+        """Compacted ``current_amount`` plus ledger entries still pending"""
+        return self.current_amount + (getattr(self, 'pending_amount', None) or Decimal('0.00'))
+
     @property
     def progress_percentage(self):
         if self.target_amount <= 0:
             return 0
-        return min((self.current_amount / self.target_amount) * 100, 100)
+        return min((self.saved_amount / self.target_amount) * 100, 100)
+
+    @property
+    def is_target_reached(self):
+        return self.saved_amount >= self.target_amount
 
     @property
     def remaining_amount(self):
-        return max(self.target_amount - self.current_amount, 0)
+        return max(self.target_amount - self.saved_amount, 0)
 
     @property
     def formatted_target_amount(self):
@@ -50,16 +143,53 @@ class SavingsGoal(models.Model):
 
     @property
     def formatted_current_amount(self):
-        return f"${self.current_amount:,.2f}"
+        return f"${self.saved_amount:,.2f}"
 
     @property
     def formatted_remaining_amount(self):
         return f"${self.remaining_amount:,.2f}"
 
     def save(self, *args, **kwargs):
-        # Auto-mark as completed if current amount reaches target
-        if self.current_amount >= self.target_amount:
-            self.is_completed = True
-        else:
-            self.is_completed = False
-        super().save(*args, **kwargs)
\ No newline at end of file
+        # Auto-mark as completed if the saved amount reaches target
+        self.is_completed = self.is_target_reached
+        super().save(*args, **kwargs)
+        goals_changed(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        goals_changed(self.user_id)
+        return result
+
+
+class GoalContribution(models.Model):
+    """Append-only ledger of changes to a goal's saved amount.
+
+    Recording a contribution is a plain insert that never locks the goal row;
+    pending entries are folded into ``SavingsGoal.current_amount`` by
+    ``goals.ledger.compact_contributions`` and kept afterwards as history.
+    """
+    CONTRIBUTION = 'contribution'
+    ADJUSTMENT = 'adjustment'
+    SOURCES = [
+        (CONTRIBUTION, 'Contribution'),
+        (ADJUSTMENT, 'Adjustment'),
+    ]
+
+    goal = models.ForeignKey(SavingsGoal, on_delete=models.CASCADE, related_name='contributions')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    source = models.CharField(max_length=20, choices=SOURCES, default=CONTRIBUTION)
+    is_applied = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['goal', 'amount'],
+                condition=models.Q(is_applied=False),
+                name='goal_pending_contrib_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.goal_id} - {self.source} - ${self.amount}"
@@ -1,14 +1,45 @@
 from rest_framework import serializers
+from budget_tracker.metrics import ProfiledSerializerMixin
+from transactions.models import format_currency
+from .ledger import set_saved_amount
 from .models import SavingsGoal
 
 
-class SavingsGoalSerializer(serializers.ModelSerializer):
-    progress_percentage = serializers.ReadOnlyField()
-    remaining_amount = serializers.ReadOnlyField()
-    formatted_target_amount = serializers.ReadOnlyField()
-    formatted_current_amount = serializers.ReadOnlyField()
-    formatted_remaining_amount = serializers.ReadOnlyField()
-    user_name = serializers.CharField(source='user.full_name', read_only=True)
+class SavedAmountMixin:
+    """Show and set ``current_amount`` as the goal's effective saved amount.
+
+    The instance must come from ``SavingsGoal.objects.with_balance()``. Changes
+    to the amount are recorded as ledger adjustments rather than written to
+    the goal row, so they cannot overwrite concurrent contributions that are
+    still pending.
+    """
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['current_amount'] = self.fields['current_amount'].to_representation(instance.saved_amount)
+        return data
+
+    def update(self, instance, validated_data):
+        amount = validated_data.pop('current_amount', None)
+        if amount is not None:
+            set_saved_amount(instance, amount)
+        if validated_data:
+            # Amount-only updates never write the goal row
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=[*validated_data, 'is_completed', 'updated_at'])
+        return instance
+
+
+class SavingsGoalSerializer(ProfiledSerializerMixin, SavedAmountMixin, serializers.ModelSerializer):
+    """Serializes goals, preferring the ``with_progress()`` annotations when present"""
+    progress_percentage = serializers.SerializerMethodField()
+    remaining_amount = serializers.SerializerMethodField()
+    formatted_target_amount = serializers.SerializerMethodField()
+    formatted_current_amount = serializers.SerializerMethodField()
+    formatted_remaining_amount = serializers.SerializerMethodField()
+    is_completed = serializers.SerializerMethodField()
+    user_name = serializers.SerializerMethodField()
 
     class Meta:
         model = SavingsGoal
@@ -18,7 +49,33 @@ class SavingsGoalSerializer(serializers.ModelSerializer):
             'formatted_target_amount', 'formatted_current_amount', 
             'formatted_remaining_amount', 'user_name', 'created_at', 'updated_at'
         ]
-        read_only_fields = ('id', 'is_completed', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'created_at', 'updated_at')
+
+    def get_progress_percentage(self, obj):
+        progress = getattr(obj, 'progress', None)
+        return obj.progress_percentage if progress is None else progress
+
+    def get_remaining_amount(self, obj):
+        remaining = getattr(obj, 'remaining', None)
+        return obj.remaining_amount if remaining is None else remaining
+
+    def get_formatted_target_amount(self, obj):
+        return format_currency(obj.target_amount)
+
+    def get_formatted_current_amount(self, obj):
+        return format_currency(obj.saved_amount)
+
+    def get_formatted_remaining_amount(self, obj):
+        return format_currency(self.get_remaining_amount(obj))
+
+    def get_is_completed(self, obj):
+        return obj.is_target_reached
+
+    def get_user_name(self, obj):
+        # Views put the owner's name in the context to avoid a user query per row
+        if 'owner_name' in self.context:
+            return self.context['owner_name']
+        return obj.user.full_name
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -28,13 +85,14 @@ class SavingsGoalSerializer(serializers.ModelSerializer):
         if data.get('current_amount', 0) < 0:
             raise serializers.ValidationError("Current amount cannot be negative")
         
-        if data.get('target_amount', 0) <= 0:
+        # Partial updates may leave the target out
+        if 'target_amount' in data and data['target_amount'] <= 0:
             raise serializers.ValidationError("Target amount must be greater than zero")
         
         return data
 
 
-class SavingsGoalUpdateSerializer(serializers.ModelSerializer):
+class SavingsGoalUpdateSerializer(ProfiledSerializerMixin, SavedAmountMixin, serializers.ModelSerializer):
     """Serializer for updating current amount in savings goals"""
     
     class Meta:
@@ -44,4 +102,4 @@ class SavingsGoalUpdateSerializer(serializers.ModelSerializer):
     def validate_current_amount(self, value):
         if value < 0:
             raise serializers.ValidationError("Current amount cannot be negative")
-        return value
\ No newline at end of file
+        return value
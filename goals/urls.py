@@ -6,5 +6,9 @@ urlpatterns = [
     path('goals/<int:pk>/', views.SavingsGoalDetailView.as_view(), name='goals-detail'),
     path('goals/<int:pk>/update-amount/', views.SavingsGoalUpdateAmountView.as_view(), name='goals-update-amount'),
     path('goals/<int:goal_id>/add/', views.add_to_goal, name='goals-add-amount'),
+    path('goals/<int:pk>/forecast/', views.goal_forecast, name='goals-forecast'),
+    path('goals/contributions/', views.add_to_goals, name='goals-add-amounts'),
+    path('goals/bulk/', views.bulk_goals, name='goals-bulk'),
+    path('goals/forecast/', views.goals_forecast, name='goals-forecast-all'),
     path('goals/summary/', views.goals_summary, name='goals-summary'),
 ]
\ No newline at end of file
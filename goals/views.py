@@ -1,43 +1,81 @@
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Sum, Avg
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Least
+from django.db.models.lookups import GreaterThanOrEqual
+from decimal import Decimal
+from accounts.mixins import OwnerNameContextMixin
+from accounts.versioning import GOALS, TRANSACTIONS, DataVersionETagMixin, etag_on_data_version, request_data_version
+from budget_tracker.replicas import replica_reads
+from .bulk import create_goals, update_goals
+from .caching import goals_summary_cache_key
+from .forecasting import FORECAST_MONTHS, MAX_FORECAST_MONTHS, forecast_goals, monthly_net_savings
+from .ledger import record_contributions
 from .models import SavingsGoal
 from .serializers import SavingsGoalSerializer, SavingsGoalUpdateSerializer
 
+CENTS = Decimal('0.01')
 
-class SavingsGoalListCreateView(generics.ListCreateAPIView):
-    """List all savings goals for the authenticated user or create a new goal"""
+
+class SavingsGoalListCreateView(DataVersionETagMixin, OwnerNameContextMixin, generics.ListCreateAPIView):
+    """List all savings goals for the authenticated user or create a new goal.
+
+    Progress and remaining amount are computed in SQL, so ``?ordering=``
+    (``progress``, ``deadline`` or ``remaining``, ``-`` for descending) sorts
+    and pages the list in one query.
+    """
+    etag_scopes = (GOALS,)
     serializer_class = SavingsGoalSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    ordering_fields = {
+        'progress': 'progress',
+        'deadline': 'deadline',
+        'remaining': 'remaining',
+    }
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return SavingsGoal.objects.none()  # For schema generation
             
-        queryset = SavingsGoal.objects.filter(user=self.request.user)
+        queryset = SavingsGoal.objects.filter(user=self.request.user).with_balance().with_progress()
         
-        # Filter by completion status
+        # Filter by completion status of the saved amount, pending contributions included
         is_completed = self.request.query_params.get('completed')
         if is_completed is not None:
             if is_completed.lower() in ['true', '1']:
-                queryset = queryset.filter(is_completed=True)
+                queryset = queryset.completed()
             elif is_completed.lower() in ['false', '0']:
-                queryset = queryset.filter(is_completed=False)
+                queryset = queryset.completed(False)
+
+        ordering = self.request.query_params.get('ordering')
+        if ordering:
+            field = self.ordering_fields.get(ordering.lstrip('-'))
+            if field is None:
+                raise ValidationError({
+                    'ordering': f"Expected one of {', '.join(self.ordering_fields)}, optionally prefixed with '-'"
+                })
+            # Goals without a deadline sort last either way; id keeps pages stable
+            expression = F(field).desc(nulls_last=True) if ordering.startswith('-') else F(field).asc(nulls_last=True)
+            queryset = queryset.order_by(expression, 'id')
         
         return queryset
 
 
-class SavingsGoalDetailView(generics.RetrieveUpdateDestroyAPIView):
+class SavingsGoalDetailView(OwnerNameContextMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a specific savings goal"""
     serializer_class = SavingsGoalSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return SavingsGoal.objects.none()  # For schema generation
-        return SavingsGoal.objects.filter(user=self.request.user)
+        return SavingsGoal.objects.filter(user=self.request.user).with_balance()
 
 
 class SavingsGoalUpdateAmountView(generics.UpdateAPIView):
@@ -48,38 +86,49 @@ class SavingsGoalUpdateAmountView(generics.UpdateAPIView):
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return SavingsGoal.objects.none()  # For schema generation
-        return SavingsGoal.objects.filter(user=self.request.user)
+        return SavingsGoal.objects.filter(user=self.request.user).with_balance()
 
 
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_on_data_version(GOALS)
 def goals_summary(request):
     """Get summary statistics for user's savings goals"""
     user = request.user
-    goals = SavingsGoal.objects.filter(user=user)
-    
-    total_goals = goals.count()
-    completed_goals = goals.filter(is_completed=True).count()
-    active_goals = goals.filter(is_completed=False).count()
-    
-    total_target_amount = goals.aggregate(
-        total=Sum('target_amount')
-    )['total'] or 0
-    
-    total_saved_amount = goals.aggregate(
-        total=Sum('current_amount')
-    )['total'] or 0
-    
-    average_progress = goals.aggregate(
-        avg_progress=Avg('current_amount')
-    )['avg_progress'] or 0
+    key = goals_summary_cache_key(user.pk, request_data_version(request, GOALS))
+    summary = cache.get(key)
+    if summary is not None:
+        return Response(summary)
+
+    # Saved amounts include contributions not yet compacted into current_amount
+    saved = F('current_amount') + F('pending_amount')
+    # Per-goal progress as a percentage of its target, capped at 100
+    progress = Least(
+        Cast(saved, FloatField()) * 100.0 / Cast('target_amount', FloatField()),
+        Value(100.0)
+    )
+    figures = SavingsGoal.objects.filter(user=user).with_balance().aggregate(
+        total_goals=Count('id'),
+        completed_goals=Count('id', filter=Q(GreaterThanOrEqual(saved, F('target_amount')))),
+        total_target_amount=Sum('target_amount'),
+        total_saved_amount=Sum(saved),
+        average_progress=Avg(progress),
+    )
+
+    total_goals = figures['total_goals']
+    completed_goals = figures['completed_goals']
+    active_goals = total_goals - completed_goals
+    total_target_amount = figures['total_target_amount'] or 0
+    total_saved_amount = figures['total_saved_amount'] or 0
+    average_progress = figures['average_progress'] or 0
     
     # Calculate overall progress percentage
     overall_progress = 0
     if total_target_amount > 0:
         overall_progress = (total_saved_amount / total_target_amount) * 100
     
-    return Response({
+    summary = {
         'total_goals': total_goals,
         'completed_goals': completed_goals,
         'active_goals': active_goals,
@@ -87,48 +136,197 @@ def goals_summary(request):
         'total_saved_amount': total_saved_amount,
         'remaining_amount': max(total_target_amount - total_saved_amount, 0),
         'overall_progress_percentage': round(overall_progress, 2),
+        'average_progress_percentage': round(average_progress, 2),
         'completion_rate': round((completed_goals / total_goals) * 100, 2) if total_goals > 0 else 0
+    }
+    cache.set(key, summary)
+    return Response(summary)
+
+
+def _forecast_months(request):
+    """Read the ``months`` of history to forecast from, raising ``ValueError`` if invalid"""
+    months = int(request.query_params.get('months', FORECAST_MONTHS))
+    if not 1 <= months <= MAX_FORECAST_MONTHS:
+        raise ValueError
+    return months
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@etag_on_data_version(TRANSACTIONS, GOALS)
+def goal_forecast(request, pk):
+    """Forecast when a savings goal reaches its target from recent monthly net savings"""
+    try:
+        months = _forecast_months(request)
+    except ValueError:
+        return Response(
+            {'error': f'months must be an integer between 1 and {MAX_FORECAST_MONTHS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    goal = SavingsGoal.objects.filter(pk=pk, user=request.user).with_balance().first()
+    if goal is None:
+        return Response(
+            {'error': 'Savings goal not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    history = monthly_net_savings(request.user, months)
+    return Response(forecast_goals([goal], history)[0])
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@etag_on_data_version(TRANSACTIONS, GOALS)
+def goals_forecast(request):
+    """Forecast every active savings goal of the user in one call"""
+    try:
+        months = _forecast_months(request)
+    except ValueError:
+        return Response(
+            {'error': f'months must be an integer between 1 and {MAX_FORECAST_MONTHS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    goals = SavingsGoal.objects.filter(user=request.user).with_balance().completed(False)
+    history = monthly_net_savings(request.user, months)
+    return Response({
+        'months': months,
+        'monthly_net_savings': history,
+        'goals': forecast_goals(goals, history),
     })
 
 
+# Bounded like GoalContribution.amount, so out-of-range values are a 400 rather than a failed write
+CONTRIBUTION_AMOUNT = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=CENTS)
+
+
+def _parse_amount(value):
+    """Parse a contribution into a positive Decimal that fits ``GoalContribution.amount``.
+
+    Raises ``ValueError`` with a client-facing message when the value is invalid.
+    """
+    if value in (None, ''):
+        raise ValueError('Amount is required')
+    try:
+        return CONTRIBUTION_AMOUNT.run_validation(value)
+    except ValidationError as exc:
+        raise ValueError(exc.detail[0])
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_to_goal(request, goal_id):
     """Add amount to a specific savings goal"""
     try:
-        goal = SavingsGoal.objects.get(id=goal_id, user=request.user)
-    except SavingsGoal.DoesNotExist:
+        amount = _parse_amount(request.data.get('amount'))
+    except ValueError as exc:
+        return Response(
+            {'error': str(exc)}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    goal = SavingsGoal.objects.filter(
+        id=goal_id, user=request.user
+    ).with_balance().first()
+    if goal is None:
         return Response(
             {'error': 'Savings goal not found'}, 
             status=status.HTTP_404_NOT_FOUND
         )
-    
-    amount = request.data.get('amount')
-    if not amount:
+
+    # Append to the ledger instead of updating the goal row
+    record_contributions(request.user.pk, {goal.pk: amount})
+    goal.pending_amount += amount
+    serializer = SavingsGoalSerializer(goal, context={'owner_name': request.user.full_name})
+    return Response({
+        'message': f'Successfully added ${amount:.2f} to {goal.title}',
+        'goal': serializer.data
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def add_to_goals(request):
+    """Record many contributions to the user's goals in one transaction.
+
+    Expects a list of ``{"goal_id": ..., "amount": ...}`` objects. Either every
+    contribution is recorded or, if any is invalid, none is.
+    """
+    if not isinstance(request.data, list) or not request.data:
         return Response(
-            {'error': 'Amount is required'}, 
+            {'error': 'Expected a non-empty list of contributions'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    
-    try:
-        amount = float(amount)
-        if amount <= 0:
-            return Response(
-                {'error': 'Amount must be greater than zero'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-    except (ValueError, TypeError):
+
+    totals = {}
+    errors = []
+    for index, contribution in enumerate(request.data):
+        if not isinstance(contribution, dict):
+            errors.append({'row': index, 'error': 'Expected an object with goal_id and amount'})
+            continue
+        try:
+            goal_id = int(contribution.get('goal_id'))
+        except (TypeError, ValueError):
+            errors.append({'row': index, 'error': 'Invalid goal_id'})
+            continue
+        try:
+            amount = _parse_amount(contribution.get('amount'))
+        except ValueError as exc:
+            errors.append({'row': index, 'error': str(exc)})
+            continue
+        totals[goal_id] = totals.get(goal_id, Decimal('0.00')) + amount
+
+    # Each goal's contributions are recorded as one ledger entry, which must fit too
+    for goal_id, total in totals.items():
+        try:
+            _parse_amount(total)
+        except ValueError as exc:
+            errors.append({'goal_id': goal_id, 'error': str(exc)})
+
+    if errors:
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    goals = list(
+        SavingsGoal.objects.filter(user=request.user, pk__in=list(totals)).with_balance()
+    )
+    missing = set(totals) - {goal.pk for goal in goals}
+    if missing:
         return Response(
-            {'error': 'Invalid amount format'}, 
+            {'error': 'Savings goal not found', 'goal_ids': sorted(missing)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    record_contributions(request.user.pk, totals)
+    for goal in goals:
+        goal.pending_amount += totals[goal.pk]
+    serializer = SavingsGoalSerializer(goals, many=True, context={'owner_name': request.user.full_name})
+    return Response({'goals': serializer.data})
+
+
+@api_view(['POST', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def bulk_goals(request):
+    """Create (POST) or patch (PATCH) many savings goals in one request.
+
+    Expects a list of goal objects; patched goals also carry their ``id``.
+    Either every row is applied or, if any is invalid, none is.
+    """
+    if not isinstance(request.data, list) or not request.data:
+        return Response(
+            {'error': 'Expected a non-empty list of goals'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    
-    # Add amount to current amount
-    goal.current_amount += amount
-    goal.save()
-    
-    serializer = SavingsGoalSerializer(goal)
-    return Response({
-        'message': f'Successfully added ${amount:.2f} to {goal.title}',
-        'goal': serializer.data
-    })
\ No newline at end of file
+
+    if request.method == 'POST':
+        goals, errors = create_goals(request.user, request.data)
+    else:
+        goals, errors = update_goals(request.user, request.data)
+    if errors:
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = SavingsGoalSerializer(goals, many=True, context={'owner_name': request.user.full_name})
+    return Response(
+        {'goals': serializer.data},
+        status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK
+    )
@@ -0,0 +1,120 @@
+"""Measure concurrent read/write throughput of SQLite with and without the production pragmas.
+
+Usage: python scripts/benchmark_sqlite.py [--readers 8] [--writers 2] [--seconds 5]
+
+Readers run the kind of per-user aggregate the summary endpoints issue while
+writers insert transactions in small commits, each thread on its own
+connection. Both runs use the same fresh database file layout; the "default"
+run uses Python's sqlite3 defaults (rollback journal, 5 second lock timeout).
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_tracker.db import PRODUCTION_SQLITE_PRAGMAS, apply_sqlite_pragmas  # noqa: E402
+
+USERS = 50
+SEED_ROWS = 20000
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    apply_sqlite_pragmas(connection, pragmas)
+    return connection
+
+
+def create_database(path, pragmas):
+    connection = connect(path, pragmas)
+    connection.execute(
+        'CREATE TABLE txn (id INTEGER PRIMARY KEY, user_id INTEGER, date TEXT, type TEXT, amount REAL)'
+    )
+    connection.execute('CREATE INDEX txn_user_date ON txn (user_id, date, type, amount)')
+    connection.execute('BEGIN')
+    connection.executemany(
+        'INSERT INTO txn (user_id, date, type, amount) VALUES (?, ?, ?, ?)',
+        [(random.randrange(USERS), f'2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}',
+          random.choice(('income', 'expense')), random.uniform(1, 500)) for _ in range(SEED_ROWS)],
+    )
+    connection.execute('COMMIT')
+    connection.close()
+
+
+def run(path, pragmas, readers, writers, seconds):
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        connection = connect(path, pragmas)
+        while time.monotonic() < deadline:
+            try:
+                connection.execute(
+                    'SELECT type, SUM(amount), COUNT(*) FROM txn WHERE user_id = ? '
+                    'AND date >= ? AND date < ? GROUP BY type',
+                    (random.randrange(USERS), '2024-01-01', '2024-07-01'),
+                ).fetchall()
+                count('reads')
+            except sqlite3.OperationalError:
+                count('locked')
+        connection.close()
+
+    def writer():
+        connection = connect(path, pragmas)
+        while time.monotonic() < deadline:
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                for _ in range(5):
+                    connection.execute(
+                        'INSERT INTO txn (user_id, date, type, amount) VALUES (?, ?, ?, ?)',
+                        (random.randrange(USERS), '2024-03-15', 'expense', 12.5),
+                    )
+                connection.execute('COMMIT')
+                count('writes')
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                count('locked')
+        connection.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:g}s per run')
+    for label, pragmas in (('default', {}), ('production', PRODUCTION_SQLITE_PRAGMAS)):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            create_database(path, pragmas)
+            counts = run(path, pragmas, args.readers, args.writers, args.seconds)
+        print(
+            f'{label:>10}: {counts["reads"] / args.seconds:9.0f} reads/s '
+            f'{counts["writes"] / args.seconds:7.0f} write commits/s '
+            f'{counts["locked"]:5d} "database is locked" errors'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,35 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from accounts.authentication import UserCache, user_cache
+from accounts.models import RevokedToken
+from accounts.revocation import revoked_tokens
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import date, timedelta
+from io import StringIO
+import re
+from unittest import mock
+from accounts.deletion import purge_account
+from accounts.hashing import password_hasher
+from budget_tracker.metrics import request_metrics
+from accounts.models import AccountDeletionRequest
+from goals.models import GoalContribution, SavingsGoal
+from transactions.models import MonthlyRollup, Transaction
 
 User = get_user_model()
 
 
 class AccountsTestCase(TestCase):
     def setUp(self):
+        user_cache.clear()
+        revoked_tokens.clear()
         self.client = APIClient()
         self.register_url = reverse('register')
         self.login_url = reverse('login')
@@ -68,4 +89,228 @@ class AccountsTestCase(TestCase):
         }
         
         response = self.client.post(self.login_url, login_data)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sign_in_upgrades_outdated_password_hash(self):
+        """Test login and the token endpoint save a rehash of passwords stored with fewer iterations"""
+        user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123!',
+            first_name='Test', last_name='User'
+        )
+        credentials = {'email': 'test@example.com', 'password': 'testpass123!'}
+        hasher = PBKDF2PasswordHasher()
+
+        for url in [self.login_url, reverse('token_obtain_pair')]:
+            User.objects.filter(pk=user.pk).update(
+                password=hasher.encode('testpass123!', hasher.salt(), iterations=1000)
+            )
+            completed = password_hasher.stats()['completed']
+            response = self.client.post(url, credentials)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(password_hasher.stats()['completed'], completed + 1)
+            user.refresh_from_db()
+            self.assertEqual(hasher.decode(user.password)['iterations'], hasher.iterations)
+            self.assertTrue(user.check_password('testpass123!'))
+
+        response = self.client.post(reverse('token_obtain_pair'), dict(credentials, password='wrong'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def login(self):
+        User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123!',
+            first_name='Test',
+            last_name='User'
+        )
+        response = self.client.post(self.login_url, {'email': 'test@example.com', 'password': 'testpass123!'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['tokens']['access']}")
+        return response.data['tokens']
+
+    def test_authenticated_user_is_cached(self):
+        """Test the user lookup is cached and dropped when the user is saved"""
+        self.login()
+        profile_url = reverse('user_profile')
+        self.assertEqual(self.client.get(profile_url).status_code, status.HTTP_200_OK)
+
+        # The user comes from the cache: no query at all
+        with self.assertNumQueries(0):
+            response = self.client.get(profile_url)
+        self.assertEqual(response.data['first_name'], 'Test')
+
+        response = self.client.patch(profile_url, {'first_name': 'Renamed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(profile_url).data['first_name'], 'Renamed')
+
+        # Another worker's copy is retired through the shared generation key
+        user = User.objects.get(email='test@example.com')
+        other_worker = UserCache(max_size=10, ttl=60)
+        other_worker.set(user.pk, user, other_worker.generation(user.pk))
+        self.assertEqual(other_worker.get(user.pk).first_name, 'Renamed')
+
+        user.is_active = False
+        user.save()
+        self.assertIsNone(other_worker.get(user.pk))
+        self.assertEqual(self.client.get(profile_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stateless_reads(self):
+        """Test safe requests can use the user from token claims"""
+        self.login()
+        with self.settings(AUTH_STATELESS_READS=True):
+            user = User.objects.get(email='test@example.com')
+            user.savings_goals.create(title='Goal', target_amount=Decimal('10.00'))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('goals-list-create'))
+            self.assertFalse([q for q in queries.captured_queries if 'FROM "accounts_user"' in q['sql']])
+            # Reads still filter on the token's user
+            self.assertEqual(response.data['results'][0]['user_name'], 'Test User')
+
+            # The profile needs the full record
+            response = self.client.get(reverse('user_profile'))
+            self.assertIn('created_at', response.data)
+
+    def test_refresh_token_rotation_revokes_old_token(self):
+        """Test a rotated refresh token cannot be used again"""
+        tokens = self.login()
+        refresh_url = reverse('token_refresh')
+
+        response = self.client.post(refresh_url, {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(RevokedToken.objects.exists())
+
+        # The revoked token is rejected from memory, without a query
+        with self.assertNumQueries(0):
+            response = self.client.post(refresh_url, {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Other processes pick the revocation up from the database
+        revoked_tokens.clear()
+        response = self.client.post(refresh_url, {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_refresh_token(self):
+        """Test logging out revokes the refresh token"""
+        tokens = self.login()
+        response = self.client.post(reverse('logout'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(reverse('logout'), {'refresh': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_purge_revoked_tokens(self):
+        """Test expired revocations are purged"""
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(days=1))
+        call_command('purge_revoked_tokens', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+    def test_account_deletion_is_purged_in_batches(self):
+        """Test account deletion deactivates first and purges resumably in batches"""
+        self.login()
+        user = User.objects.get(email='test@example.com')
+        for day in range(1, 6):
+            Transaction.objects.create(
+                user=user, amount=Decimal('10.00'), type='expense', category='food', date=date(2024, 1, day)
+            )
+        goal = SavingsGoal.objects.create(user=user, title='Goal', target_amount=Decimal('100.00'))
+        GoalContribution.objects.create(goal=goal, amount=Decimal('5.00'))
+
+        response = self.client.post(reverse('delete_account'), {'password': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(ACCOUNT_PURGE_IN_BACKGROUND=False):
+            response = self.client.post(reverse('delete_account'), {'password': 'testpass123!'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+        self.assertEqual(self.client.get(reverse('user_profile')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # An interrupted purge keeps what it deleted and resumes from there
+        deletion = AccountDeletionRequest.objects.get(user_id=user.pk)
+        with mock.patch('accounts.deletion.time.sleep', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                purge_account(deletion, batch_size=2, pause=1)
+        self.assertFalse(SavingsGoal.objects.exists())
+        self.assertEqual(Transaction.objects.count(), 3)
+
+        call_command('purge_deleted_accounts', '--batch-size', '2', stdout=StringIO())
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(MonthlyRollup.objects.exists())
+        self.assertFalse(SavingsGoal.objects.exists())
+        deletion.refresh_from_db()
+        self.assertIsNotNone(deletion.completed_at)
+        self.assertEqual(deletion.deleted_rows, 8)
+
+    def test_sign_in_backpressure(self):
+        """Test sign-ins are refused with 429 when the hashing pool is saturated"""
+        self.login()
+        credentials = {'email': 'test@example.com', 'password': 'testpass123!'}
+        completed = password_hasher.stats()['completed']
+
+        with mock.patch.object(password_hasher, 'queue_size', -password_hasher.workers):
+            response = self.client.post(self.login_url, credentials)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response['Retry-After'], '1')
+            data = dict(self.user_data, email='other@example.com', username='other')
+            response = self.client.post(self.register_url, data)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            response = self.client.post(reverse('token_obtain_pair'), credentials)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            response = self.client.post(reverse('delete_account'), {'password': 'testpass123!'})
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertTrue(User.objects.get(email='test@example.com').is_active)
+
+        response = self.client.post(self.login_url, dict(credentials, password='wrong'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123!',
+            first_name='Admin', last_name='User'
+        ))
+        stats = self.client.get(reverse('hashing_stats')).data
+        self.assertEqual(stats['completed'], completed + 1)
+        self.assertGreaterEqual(stats['rejected'], 2)
+        self.assertEqual(stats['queued'], 0)
+
+    def test_request_metrics(self):
+        """Test requests get a Server-Timing header and are exported to admins as Prometheus metrics"""
+        request_metrics.reset()
+        self.client.force_authenticate(User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123!',
+            first_name='Test', last_name='User'
+        ))
+        response = self.client.get(reverse('monthly-summary'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], (
+            r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render;dur=[\d.]+, total;dur=[\d.]+$'
+        ))
+
+        # Streamed exports query while their body is sent and are recorded after
+        response = self.client.get(reverse('transaction-export'))
+        self.assertNotIn('Server-Timing', response)
+        b''.join(response.streaming_content)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123!',
+            first_name='Admin', last_name='User'
+        ))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        labels = '{endpoint="monthly-summary",method="GET"'
+        self.assertIn(f'budget_tracker_http_requests_total{labels},status="200"}} 1\n', body)
+        self.assertIn(f'budget_tracker_http_request_duration_seconds_bucket{labels},le="+Inf"}} 1\n', body)
+        self.assertIn(f'budget_tracker_db_queries_per_request_count{labels}}} 1\n', body)
+        export = '{endpoint="transaction-export",method="GET"'
+        self.assertIn(f'budget_tracker_db_queries_per_request_sum{export}}} 1\n', body)
+        self.assertIn(f'budget_tracker_render_duration_seconds_sum{labels}}}', body)
+        # The summary serializer ran inside the view, before rendering
+        serialized = re.search(rf'^budget_tracker_serialize_duration_seconds_sum{re.escape(labels)}}} (\S+)$', body, re.M)
+        self.assertGreater(float(serialized.group(1)), 0)
+        self.assertIn('budget_tracker_password_hash_workers ', body)
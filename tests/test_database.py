@@ -0,0 +1,336 @@
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import ShardAssignment
+from accounts.rebalancing import _user_rows, move_user, pin_users, rebalance
+from accounts.versioning import GOALS, TRANSACTIONS, get_data_versions
+from budget_tracker.replicas import ReplicaMiddleware, copy_database, is_primary_sticky
+from budget_tracker.sharding import (
+    ShardNotSelected, data_aliases, hash_shard, shard_for_user, shard_placement, user_shard, using_shard,
+)
+from goals.models import GoalContribution, SavingsGoal
+from transactions.models import MonthlyRollup, Transaction
+from transactions.views import TransactionListCreateView, export_transactions, monthly_summary
+
+User = get_user_model()
+
+
+class SQLiteTuningTestCase(TestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        """Test the database's PRAGMAS are applied when a connection is created"""
+        connection = connections.create_connection('default')
+        connection.settings_dict = dict(
+            connection.settings_dict,
+            PRAGMAS={'cache_size': -2048, 'temp_store': 'MEMORY', 'busy_timeout': 1234},
+        )
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                self.assertEqual(cursor.fetchone()[0], -2048)
+                cursor.execute('PRAGMA temp_store')
+                self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 1234)
+        finally:
+            connection.close()
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123!',
+        )
+
+    def read_alias(self, request, view, authenticate=True):
+        """Serve ``request`` through ReplicaMiddleware and return where its reads go"""
+        aliases = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            if authenticate:
+                request.user = self.user  # as DRF does once the token is checked
+            aliases.append(router.db_for_read(Transaction))
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        middleware(request)
+        return aliases[0]
+
+    def test_read_only_views_use_replica(self):
+        """Test safe requests to opted-in views read from the replica"""
+        self.assertEqual(self.read_alias(self.factory.get('/'), monthly_summary), 'replica')
+        self.assertEqual(self.read_alias(self.factory.get('/'), TransactionListCreateView.as_view()), 'replica')
+        self.assertEqual(self.read_alias(self.factory.get('/'), export_transactions), 'default')
+        self.assertEqual(self.read_alias(self.factory.get('/'), monthly_summary, authenticate=False), 'default')
+        self.assertEqual(router.db_for_write(Transaction), 'default')
+
+    def test_writers_stick_to_primary(self):
+        """Test a user's reads go to the primary for a while after they write"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertFalse(is_primary_sticky(self.user.pk))
+
+        response = client.post(reverse('transaction-list-create'), {
+            'amount': '12.50', 'type': 'expense', 'category': 'food',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(is_primary_sticky(self.user.pk))
+        self.assertEqual(self.read_alias(self.factory.get('/'), monthly_summary), 'default')
+
+        response = client.get(reverse('monthly-summary'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_expenses'], Decimal('12.50'))
+
+    def test_copy_database(self):
+        """Test the replica copy is a full snapshot of the source database"""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(source)) as db, db:
+                db.execute('CREATE TABLE entry (amount INTEGER)')
+                db.executemany('INSERT INTO entry VALUES (?)', [(1,), (2,), (3,)])
+
+            copy_database(source, target)
+            with closing(sqlite3.connect(target)) as db:
+                self.assertEqual(db.execute('SELECT SUM(amount) FROM entry').fetchone()[0], 6)
+
+
+class ShardedTestCase(TestCase):
+    """Runs with ``SHARDS`` as real shard databases, created in temporary files for the class"""
+    SHARDS = ['shard_0', 'shard_1']
+    # Resolved in setUpClass, once the shard aliases exist
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.shard_directory = tempfile.TemporaryDirectory()
+        for alias in cls.SHARDS:
+            connections.settings[alias] = dict(
+                connections.settings['default'],
+                NAME=os.path.join(cls.shard_directory.name, f'{alias}.sqlite3'),
+            )
+        cls.shard_settings = override_settings(SHARD_DATABASES=cls.SHARDS)
+        cls.shard_settings.enable()
+        for alias in cls.SHARDS:
+            call_command('migrate', database=alias, run_syncdb=True, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.SHARDS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.shard_settings.disable()
+        cls.shard_directory.cleanup()
+
+    def create_user(self, username, shard):
+        """A user whose rows live on ``shard``"""
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpass123!',
+        )
+        if hash_shard(user.pk) != shard:
+            ShardAssignment.objects.create(user=user, alias=shard)
+        return user
+
+
+class ShardRoutingTestCase(ShardedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123!',
+        )
+
+    def test_users_are_routed_to_their_shard(self):
+        """Test sharded models go to the user's hash placement unless they are pinned"""
+        placement = hash_shard(self.user.pk)
+        self.assertEqual(shard_for_user(self.user.pk), placement)
+        with user_shard(self.user.pk):
+            self.assertEqual(router.db_for_read(Transaction), placement)
+            self.assertEqual(router.db_for_write(SavingsGoal), placement)
+        self.assertEqual(router.db_for_write(Transaction, instance=self.user), placement)
+
+        other = 'shard_1' if placement == 'shard_0' else 'shard_0'
+        ShardAssignment.objects.create(user=self.user, alias=other)
+        with user_shard(self.user.pk):
+            self.assertEqual(router.db_for_read(MonthlyRollup), other)
+
+    def test_unscoped_queries_are_refused(self):
+        """Test sharded models cannot be queried without a user or shard, other models stay put"""
+        with self.assertRaises(ShardNotSelected):
+            router.db_for_read(Transaction)
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(data_aliases(), ['shard_0', 'shard_1'])
+
+    def test_data_versions_follow_shard_commits(self):
+        """Test data versions are bumped only once the shard's transaction commits"""
+        user = self.create_user('sharded', 'shard_1')
+        with self.captureOnCommitCallbacks(using='shard_1', execute=True):
+            with user_shard(user.pk):
+                Transaction.objects.create(user=user, amount=Decimal('5.00'), type='expense', category='food')
+                SavingsGoal.objects.create(user=user, title='Trip', target_amount=Decimal('100.00'))
+            self.assertEqual(get_data_versions(user.pk, [TRANSACTIONS, GOALS]), (0, 0))
+        self.assertEqual(get_data_versions(user.pk, [TRANSACTIONS, GOALS]), (1, 1))
+
+    def test_views_serve_the_users_shard(self):
+        """Test every transaction and goal endpoint reads and writes the user's own shard"""
+        user = self.create_user('sharded', 'shard_1')
+        neighbour = self.create_user('neighbour', 'shard_0')
+        with user_shard(neighbour.pk):
+            Transaction.objects.create(user=neighbour, amount=Decimal('99.00'), type='expense',
+                                       category='food', description='Not yours')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.post(reverse('transaction-list-create'), {
+            'amount': '12.50', 'type': 'expense', 'category': 'food', 'description': 'Groceries',
+        })
+        self.assertEqual(response.status_code, 201)
+        pk = response.data['id']
+        self.assertTrue(Transaction.objects.using('shard_1').filter(pk=pk, user=user).exists())
+        self.assertFalse(Transaction.objects.using('shard_0').filter(user=user).exists())
+
+        response = client.get(reverse('transaction-list-create'), {'q': 'groc'})
+        self.assertEqual([row['id'] for row in response.data['results']], [pk])
+        response = client.get(reverse('transaction-detail', kwargs={'pk': pk}))
+        self.assertEqual(response.data['description'], 'Groceries')
+        response = client.patch(reverse('transaction-detail', kwargs={'pk': pk}), {'amount': '15.00'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(client.get(reverse('monthly-summary')).data['total_expenses'], Decimal('15.00'))
+        today = timezone.localdate()
+        response = client.get(reverse('monthly-summary'), {'from': f'{today:%Y-%m}', 'to': f'{today:%Y-%m}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get(reverse('transaction-stats')).status_code, 200)
+
+        response = client.get(reverse('transaction-export'), {'fmt': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [pk])
+
+        response = client.post(reverse('goals-list-create'), {'title': 'Trip', 'target_amount': '100.00'})
+        goal_id = response.data['id']
+        response = client.post(reverse('goals-add-amount', kwargs={'goal_id': goal_id}), {'amount': '30.00'})
+        self.assertEqual(response.status_code, 200)
+        response = client.post(reverse('goals-add-amounts'), [{'goal_id': goal_id, 'amount': '10.00'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get(reverse('goals-summary')).data['total_saved_amount'], Decimal('40.00'))
+        self.assertEqual(GoalContribution.objects.using('shard_1').filter(goal_id=goal_id).count(), 2)
+        self.assertFalse(SavingsGoal.objects.using('shard_0').filter(user=user).exists())
+
+        response = client.delete(reverse('transaction-detail', kwargs={'pk': pk}))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Transaction.objects.using('shard_1').filter(user=user).exists())
+        self.assertEqual(Transaction.objects.using('shard_0').filter(user=neighbour).count(), 1)
+
+
+class RebalancingTestCase(ShardedTestCase):
+    def create_rows(self, user):
+        with user_shard(user.pk):
+            Transaction.objects.create(user=user, amount=Decimal('5.00'), type='expense', category='food',
+                                       date=date(2024, 3, 1))
+            Transaction.objects.create(user=user, amount=Decimal('7.00'), type='expense', category='rent',
+                                       date=date(2024, 3, 2))
+            goal = SavingsGoal.objects.create(user=user, title='Trip', target_amount=Decimal('100.00'))
+            GoalContribution.objects.create(goal=goal, amount=Decimal('10.00'))
+            GoalContribution.objects.create(goal=goal, amount=Decimal('15.00'))
+
+    def test_move_user(self):
+        """Test a move copies every row under new ids and deletes the originals"""
+        user = self.create_user('mover', 'shard_0')
+        self.create_rows(user)
+        created_at = Transaction.objects.using('shard_0').order_by('pk').values_list('created_at', flat=True)[0]
+
+        # 2 transactions, 2 rollups, 1 goal and 2 contributions
+        self.assertEqual(move_user(user.pk, 'shard_1'), 7)
+        self.assertEqual(shard_for_user(user.pk), 'shard_1')
+        for queryset in _user_rows('shard_0', user.pk):
+            self.assertFalse(queryset.exists())
+        goal = SavingsGoal.objects.using('shard_1').get(user=user)
+        self.assertEqual(
+            sorted(GoalContribution.objects.using('shard_1').filter(goal=goal).values_list('amount', flat=True)),
+            [Decimal('10.00'), Decimal('15.00')],
+        )
+        self.assertEqual(
+            Transaction.objects.using('shard_1').order_by('pk').values_list('created_at', flat=True)[0], created_at
+        )
+        self.assertEqual(MonthlyRollup.objects.using('shard_1').filter(user=user).count(), 2)
+
+    def test_interrupted_move_can_be_retried(self):
+        """Test a failed move leaves the user writable on the source and a retry replaces leftovers"""
+        user = self.create_user('mover', 'shard_0')
+        self.create_rows(user)
+
+        with mock.patch('accounts.rebalancing._copy_user', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                move_user(user.pk, 'shard_1')
+        self.assertEqual(shard_placement(user.pk), ('shard_0', False))
+
+        # A process that died mid-move leaves the user marked as moving, with partial copies
+        ShardAssignment.objects.update_or_create(user=user, defaults={'alias': 'shard_0', 'moving': True})
+        with using_shard('shard_1'):
+            Transaction.objects.create(user=user, amount=Decimal('5.00'), type='expense', category='food')
+        self.assertEqual(move_user(user.pk, 'shard_1'), 7)
+        self.assertEqual(Transaction.objects.using('shard_1').filter(user=user).count(), 2)
+        self.assertEqual(shard_placement(user.pk), ('shard_1', False))
+
+    def test_writes_refused_while_moving(self):
+        """Test API requests can read but not change the rows of a user being moved"""
+        user = self.create_user('mover', 'shard_0')
+        self.create_rows(user)
+        ShardAssignment.objects.update_or_create(user=user, defaults={'alias': 'shard_0', 'moving': True})
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        self.assertEqual(client.get(reverse('transaction-list-create')).data['results'][0]['amount'], '7.00')
+        response = client.post(reverse('transaction-list-create'), {
+            'amount': '12.50', 'type': 'expense', 'category': 'food',
+        })
+        self.assertEqual(response.status_code, 503)
+        goal = SavingsGoal.objects.using('shard_0').get(user=user)
+        response = client.post(reverse('goals-add-amount', kwargs={'goal_id': goal.pk}), {'amount': '1.00'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(Transaction.objects.using('shard_0').filter(user=user).count(), 2)
+
+    def test_pin_and_rebalance(self):
+        """Test pinned users are moved to their hash placement and settled pins are removed"""
+        users = [self.create_user(f'user{index}', 'shard_0') for index in range(4)]
+        ShardAssignment.objects.all().delete()
+        self.assertEqual(pin_users(batch_size=3), 4)
+        self.assertEqual(pin_users(), 0)
+
+        # As if SHARD_DB_NAMES had changed: one user is pinned away from their placement
+        user = users[0]
+        away = 'shard_1' if hash_shard(user.pk) == 'shard_0' else 'shard_0'
+        ShardAssignment.objects.filter(user=user).update(alias=away)
+        self.create_rows(user)
+
+        self.assertEqual(rebalance(), (1, 7))
+        self.assertFalse(ShardAssignment.objects.exists())
+        self.assertEqual(Transaction.objects.using(hash_shard(user.pk)).filter(user=user).count(), 2)
+        self.assertFalse(Transaction.objects.using(away).filter(user=user).exists())
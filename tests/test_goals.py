@@ -3,14 +3,25 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
-from goals.models import SavingsGoal
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from goals import ledger
+from goals.models import GoalContribution, SavingsGoal
+from io import StringIO
+from unittest import mock
+from django.utils import timezone
+from datetime import date, timedelta
 from decimal import Decimal
+from transactions.models import Transaction
 
 User = get_user_model()
 
 
 class SavingsGoalsTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(
             username='testuser',
@@ -82,9 +93,10 @@ class SavingsGoalsTestCase(TestCase):
         response = self.client.post(url, {'amount': '50.00'})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['goal']['current_amount'], '150.00')
         
-        goal.refresh_from_db()
-        self.assertEqual(goal.current_amount, Decimal('150.00'))
+        goal = SavingsGoal.objects.with_balance().get(pk=goal.pk)
+        self.assertEqual(goal.saved_amount, Decimal('150.00'))
 
     def test_goals_summary(self):
         """Test goals summary endpoint"""
@@ -107,4 +119,314 @@ class SavingsGoalsTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['total_goals'], 2)
         self.assertEqual(response.data['completed_goals'], 1)
-        self.assertEqual(response.data['active_goals'], 1)
\ No newline at end of file
+        self.assertEqual(response.data['active_goals'], 1)
+
+    def test_goals_summary_single_query(self):
+        """Test goals summary figures, including average progress, come from one query"""
+        for target, current in [('1000.00', '1500.00'), ('2000.00', '500.00'), ('400.00', '100.00')]:
+            SavingsGoal.objects.create(
+                user=self.user,
+                title='Goal',
+                target_amount=Decimal(target),
+                current_amount=Decimal(current)
+            )
+
+        url = reverse('goals-summary')
+        # One query for the data version (ETag), one aggregate
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.data['total_goals'], 3)
+        self.assertEqual(response.data['completed_goals'], 1)
+        self.assertEqual(response.data['active_goals'], 2)
+        self.assertEqual(response.data['total_saved_amount'], Decimal('2100.00'))
+        # (100 + 25 + 25) / 3, with the over-funded goal capped at 100%
+        self.assertEqual(response.data['average_progress_percentage'], 50.0)
+
+    def test_goals_etag(self):
+        """Test goal reads answer 304 until a goal changes"""
+        goal = SavingsGoal.objects.create(
+            user=self.user,
+            title='Test Goal',
+            target_amount=Decimal('1000.00')
+        )
+
+        for url in [reverse('goals-list-create'), reverse('goals-summary')]:
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            goal.title = 'Renamed Goal'
+            goal.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+    def test_goals_summary_cache_invalidation(self):
+        """Test the cached goals summary is dropped when a goal changes"""
+        goal = SavingsGoal.objects.create(
+            user=self.user,
+            title='Test Goal',
+            target_amount=Decimal('1000.00'),
+            current_amount=Decimal('100.00')
+        )
+        url = reverse('goals-summary')
+        self.assertEqual(self.client.get(url).data['completed_goals'], 0)
+
+        goal.current_amount = Decimal('1000.00')
+        goal.save()
+        self.assertEqual(self.client.get(url).data['completed_goals'], 1)
+
+    def test_add_to_goal_appends_contribution(self):
+        """Test contributions are appended to the ledger with Decimal precision"""
+        goal = SavingsGoal.objects.create(
+            user=self.user,
+            title='Test Goal',
+            target_amount=Decimal('100.00'),
+            current_amount=Decimal('99.90')
+        )
+        url = reverse('goals-add-amount', kwargs={'goal_id': goal.id})
+
+        # SELECT the goal, INSERT the entry and bump the data version inside a
+        # savepoint, then count the goal's pending entries after commit
+        with self.assertNumQueries(6), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'amount': '0.10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['goal']['is_completed'])
+
+        response = self.client.post(url, {'amount': '5.05'})
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_amount, Decimal('99.90'))
+        self.assertEqual(goal.contributions.filter(is_applied=False).count(), 2)
+        self.assertEqual(SavingsGoal.objects.with_balance().get(pk=goal.pk).saved_amount, Decimal('105.05'))
+
+        for amount in ['abc', '-1', '0.001', 'NaN', '99999999999999.99', '100000000']:
+            response = self.client.post(url, {'amount': amount})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = reverse('goals-add-amount', kwargs={'goal_id': goal.id + 100})
+        response = self.client.post(url, {'amount': '1.00'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_add_to_many_goals(self):
+        """Test applying a batch of contributions to several goals at once"""
+        first = SavingsGoal.objects.create(user=self.user, title='First', target_amount=Decimal('100.00'))
+        second = SavingsGoal.objects.create(user=self.user, title='Second', target_amount=Decimal('50.00'))
+        url = reverse('goals-add-amounts')
+
+        contributions = [
+            {'goal_id': first.id, 'amount': '10.00'},
+            {'goal_id': second.id, 'amount': '30.00'},
+            {'goal_id': first.id, 'amount': '2.50'},
+            {'goal_id': second.id, 'amount': '20.00'},
+        ]
+        response = self.client.post(url, contributions, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        amounts = {goal['id']: (goal['current_amount'], goal['is_completed']) for goal in response.data['goals']}
+        self.assertEqual(amounts[first.id], ('12.50', False))
+        self.assertEqual(amounts[second.id], ('50.00', True))
+
+        # An unknown goal rolls the whole batch back
+        response = self.client.post(url, [
+            {'goal_id': first.id, 'amount': '1.00'},
+            {'goal_id': second.id + 100, 'amount': '1.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(SavingsGoal.objects.with_balance().get(pk=first.pk).saved_amount, Decimal('12.50'))
+
+        response = self.client.post(url, [{'goal_id': first.id, 'amount': 'x'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Each amount fits GoalContribution.amount, but their total for one goal does not
+        response = self.client.post(url, [
+            {'goal_id': first.id, 'amount': '60000000.00'},
+            {'goal_id': first.id, 'amount': '60000000.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0]['goal_id'], first.id)
+
+    def test_goal_contribution_compaction(self):
+        """Test pending contributions are folded into current_amount"""
+        goal = SavingsGoal.objects.create(
+            user=self.user,
+            title='Test Goal',
+            target_amount=Decimal('100.00'),
+            current_amount=Decimal('10.00')
+        )
+        url = reverse('goals-add-amount', kwargs={'goal_id': goal.id})
+        with self.settings(GOAL_COMPACTION_THRESHOLD=3):
+            self.client.post(url, {'amount': '40.00'})
+            self.client.post(url, {'amount': '30.00'})
+            goal.refresh_from_db()
+            self.assertEqual(goal.current_amount, Decimal('10.00'))
+
+            # The third pending entry reaches the threshold and is compacted after commit
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {'amount': '20.00'})
+        self.assertEqual(response.data['goal']['current_amount'], '100.00')
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_amount, Decimal('100.00'))
+        self.assertTrue(goal.is_completed)
+        self.assertFalse(goal.contributions.filter(is_applied=False).exists())
+        self.assertEqual(goal.contributions.count(), 3)
+
+        # Setting the amount records an adjustment; the command compacts it
+        url = reverse('goals-update-amount', kwargs={'pk': goal.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'current_amount': '75.00'})
+        self.assertEqual(response.data['current_amount'], '75.00')
+        # The goal row itself is not written
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('UPDATE "goals_savingsgoal"')])
+        response = self.client.get(reverse('goals-list-create'), {'completed': 'false'})
+        self.assertEqual([g['current_amount'] for g in response.data['results']], ['75.00'])
+        self.assertEqual(self.client.get(reverse('goals-summary')).data['total_saved_amount'], Decimal('75.00'))
+
+        call_command('compact_goal_contributions', stdout=StringIO())
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_amount, Decimal('75.00'))
+        self.assertFalse(goal.is_completed)
+        self.assertEqual(goal.contributions.get(source=GoalContribution.ADJUSTMENT).amount, Decimal('-25.00'))
+
+    def test_interleaved_compactions(self):
+        """Test a compaction never applies entries another run claimed first"""
+        goal = SavingsGoal.objects.create(
+            user=self.user, title='Test Goal', target_amount=Decimal('100.00')
+        )
+        GoalContribution.objects.bulk_create([
+            GoalContribution(goal=goal, amount=Decimal('5.00')) for _ in range(4)
+        ])
+
+        # The first run reads the batch, then a second run applies it before
+        # the first claims it
+        pending = GoalContribution.objects.filter(is_applied=False)
+        stale = ledger._pending_batch(pending, ledger.COMPACTION_BATCH_SIZE)
+        self.assertEqual(ledger.compact_contributions(), 4)
+
+        fresh = ledger._pending_batch
+        reads = [stale]
+        with mock.patch('goals.ledger._pending_batch',
+                        side_effect=lambda *args: reads.pop() if reads else fresh(*args)):
+            self.assertEqual(ledger.compact_contributions(), 0)
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_amount, Decimal('20.00'))
+        self.assertFalse(goal.contributions.filter(is_applied=False).exists())
+
+    def test_goal_forecast(self):
+        """Test forecasting goals from the user's monthly net savings"""
+        today = timezone.localdate()
+        for months_back, income in [(1, '900.00'), (2, '700.00'), (3, '500.00')]:
+            index = today.year * 12 + today.month - 1 - months_back
+            day = date(index // 12, index % 12 + 1, 10)
+            Transaction.objects.create(user=self.user, amount=Decimal(income), type='income', category='other', date=day)
+            Transaction.objects.create(user=self.user, amount=Decimal('200.00'), type='expense', category='food', date=day)
+        # The current month is not complete and is left out
+        Transaction.objects.create(user=self.user, amount=Decimal('5000.00'), type='income', category='other')
+
+        goal = SavingsGoal.objects.create(
+            user=self.user,
+            title='Laptop',
+            target_amount=Decimal('2000.00'),
+            current_amount=Decimal('500.00'),
+            deadline=today + timedelta(days=60)
+        )
+        SavingsGoal.objects.create(
+            user=self.user, title='Done', target_amount=Decimal('10.00'), current_amount=Decimal('10.00')
+        )
+
+        response = self.client.get(reverse('goals-forecast', kwargs={'pk': goal.id}), {'months': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # (700 + 500 + 300) / 3 = 500 a month towards the remaining 1500
+        self.assertEqual(response.data['average_monthly_savings'], Decimal('500.00'))
+        self.assertEqual(response.data['months_to_target'], 3.0)
+        self.assertEqual(response.data['projected_completion_date'], today + timedelta(days=92))
+        self.assertTrue(response.data['deadline_at_risk'])
+        self.assertGreater(response.data['required_monthly_savings'], Decimal('500.00'))
+
+        # Version check, active goals, one grouped rollup query
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('goals-forecast-all'), {'months': 3})
+        self.assertEqual(response.data['monthly_net_savings'], [Decimal('300.00'), Decimal('500.00'), Decimal('700.00')])
+        self.assertEqual([forecast['goal_id'] for forecast in response.data['goals']], [goal.id])
+
+        response = self.client.get(reverse('goals-forecast-all'), {'months': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('goals-forecast', kwargs={'pk': goal.id + 100}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_goals_list_ordering(self):
+        """Test sorting the goals list on SQL-computed progress fields"""
+        today = timezone.localdate()
+        for title, target, current, days in [
+            ('Car', '10000.00', '2500.00', 300),
+            ('Phone', '800.00', '600.00', None),
+            ('Trip', '3000.00', '300.00', 30),
+        ]:
+            SavingsGoal.objects.create(
+                user=self.user,
+                title=title,
+                target_amount=Decimal(target),
+                current_amount=Decimal(current),
+                deadline=today + timedelta(days=days) if days else None
+            )
+        url = reverse('goals-list-create')
+
+        # Data version check, page count and one SELECT for the page
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'ordering': '-progress'})
+        self.assertEqual([goal['title'] for goal in response.data['results']], ['Phone', 'Car', 'Trip'])
+        self.assertEqual(response.data['results'][0]['progress_percentage'], 75.0)
+        self.assertEqual(response.data['results'][0]['formatted_remaining_amount'], '$200.00')
+        self.assertEqual(response.data['results'][0]['user_name'], self.user.full_name)
+
+        response = self.client.get(url, {'ordering': 'remaining'})
+        self.assertEqual([goal['title'] for goal in response.data['results']], ['Phone', 'Trip', 'Car'])
+        response = self.client.get(url, {'ordering': 'deadline'})
+        self.assertEqual([goal['title'] for goal in response.data['results']], ['Trip', 'Car', 'Phone'])
+        response = self.client.get(url, {'ordering': 'title'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_and_update_goals(self):
+        """Test creating and patching many goals with bulk queries"""
+        url = reverse('goals-bulk')
+        templates = [
+            {'title': f'Template {index}', 'target_amount': '100.00', 'current_amount': '0.00'}
+            for index in range(12)
+        ]
+        templates[0]['current_amount'] = '100.00'
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, templates, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "goals_savingsgoal"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(response.data['goals']), 12)
+        self.assertEqual(SavingsGoal.objects.filter(user=self.user, is_completed=True).count(), 1)
+
+        first, second = response.data['goals'][:2]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, [
+                {'id': first['id'], 'current_amount': '40.00'},
+                {'id': second['id'], 'title': 'Renamed', 'target_amount': '50.00', 'current_amount': '60.00'},
+            ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "goals_savingsgoal"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            [(goal['title'], goal['current_amount'], goal['is_completed']) for goal in response.data['goals']],
+            [('Template 0', '40.00', False), ('Renamed', '60.00', True)]
+        )
+        second_goal = SavingsGoal.objects.get(pk=second['id'])
+        self.assertTrue(second_goal.is_completed)
+        self.assertEqual(second_goal.current_amount, Decimal('0.00'))
+        self.assertEqual(second_goal.contributions.get().amount, Decimal('60.00'))
+
+        # Any invalid row leaves every goal untouched
+        response = self.client.patch(url, [
+            {'id': first['id'], 'title': 'Changed'},
+            {'id': first['id'] + 100, 'title': 'Unknown'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+        response = self.client.post(url, [{'title': 'No target'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(SavingsGoal.objects.get(pk=first['id']).title, 'Template 0')
@@ -0,0 +1,259 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.authentication import user_cache
+from accounts.revocation import revoked_tokens
+from accounts.tokens import UserRefreshToken
+from accounts.versioning import GOALS, TRANSACTIONS, bump_data_version
+from goals.models import GoalContribution, SavingsGoal
+from transactions.models import Transaction
+
+User = get_user_model()
+
+
+class QueryBudgetMixin:
+    """Exact query counts for every API route, run against several data sizes.
+
+    Each subclass seeds ``SIZE`` transactions and goals for one user. The
+    budgets are the same for every size, so a query per row (an N+1) fails
+    the larger sizes. Caches are cleared before each request so the budgets
+    cover the uncached path.
+    """
+    SIZE = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123!',
+            first_name='Test',
+            last_name='User'
+        )
+        start = date(2024, 1, 1)
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=cls.user,
+                amount=Decimal('10.00') + index % 90,
+                type='income' if index % 4 == 0 else 'expense',
+                category=('food', 'rent', 'transport', 'health')[index % 4],
+                description=f'Purchase number {index}',
+                date=start + timedelta(days=index % 365),
+            )
+            for index in range(cls.SIZE)
+        ], batch_size=1000)
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        goals = SavingsGoal.objects.bulk_create([
+            SavingsGoal(
+                user=cls.user,
+                title=f'Goal {index}',
+                target_amount=Decimal('1000.00'),
+                deadline=start + timedelta(days=index % 700) if index % 3 else None,
+            )
+            for index in range(cls.SIZE)
+        ], batch_size=1000)
+        GoalContribution.objects.bulk_create([
+            GoalContribution(goal=goal, amount=Decimal('25.00')) for goal in goals
+        ], batch_size=1000)
+
+        # Later writes only bump existing version rows
+        bump_data_version(cls.user.pk, TRANSACTIONS)
+        bump_data_version(cls.user.pk, GOALS)
+
+        cls.transaction = Transaction.objects.filter(user=cls.user).order_by('id').first()
+        cls.goal, cls.other_goal = goals[0], goals[-1]
+
+    def setUp(self):
+        user_cache.clear()
+        revoked_tokens.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertBudget(self, budget, method, url, data=None, expected_status=status.HTTP_200_OK, **extra):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json', **extra)
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+        self.assertEqual(
+            len(queries), budget,
+            f'{method.upper()} {url} ran {len(queries)} queries with {self.SIZE} rows, budget is {budget}:\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
+
+    def authenticate_with_token(self):
+        """Send a real access token, so authentication and the user cache are budgeted too"""
+        self.client.force_authenticate(user=None)
+        access = UserRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    # Transactions
+
+    def test_transaction_list(self):
+        self.assertBudget(2, 'get', reverse('transaction-list-create'))
+        self.assertBudget(2, 'get', reverse('transaction-list-create'), {'q': 'purchase', 'type': 'expense'})
+
+    def test_transaction_create(self):
+        data = {'amount': '12.50', 'type': 'expense', 'category': 'food', 'date': '2024-03-01'}
+        self.assertBudget(8, 'post', reverse('transaction-list-create'), data, status.HTTP_201_CREATED)
+
+    def test_transaction_import(self):
+        rows = [
+            {'amount': '5.00', 'type': 'expense', 'category': 'food', 'date': f'2024-0{month}-10'}
+            for month in range(1, 6)
+        ]
+        self.assertBudget(24, 'post', reverse('transaction-list-create'), rows, status.HTTP_201_CREATED)
+
+    def test_transaction_export(self):
+        self.assertBudget(1, 'get', reverse('transaction-export'))
+
+    def test_transaction_detail(self):
+        url = reverse('transaction-detail', kwargs={'pk': self.transaction.pk})
+        self.assertBudget(1, 'get', url)
+        self.assertBudget(12, 'patch', url, {'amount': '20.00', 'category': 'health'})
+        self.assertBudget(12, 'put', url, {
+            'amount': '21.00', 'type': 'expense', 'category': 'food', 'date': '2024-02-01',
+        })
+        self.assertBudget(8, 'delete', url, expected_status=status.HTTP_204_NO_CONTENT)
+
+    def test_monthly_summary(self):
+        self.assertBudget(2, 'get', reverse('monthly-summary'), {'month': 6, 'year': 2024})
+        self.assertBudget(2, 'get', reverse('monthly-summary'), {'from': '2024-01', 'to': '2024-12'})
+
+    def test_transaction_stats(self):
+        self.assertBudget(2, 'get', reverse('transaction-stats'))
+
+    # Savings goals
+
+    def test_goal_list(self):
+        self.assertBudget(3, 'get', reverse('goals-list-create'))
+        self.assertBudget(3, 'get', reverse('goals-list-create'), {'ordering': '-remaining', 'completed': 'false'})
+
+    def test_goal_create(self):
+        data = {'title': 'New goal', 'target_amount': '500.00'}
+        self.assertBudget(2, 'post', reverse('goals-list-create'), data, status.HTTP_201_CREATED)
+
+    def test_goal_detail(self):
+        url = reverse('goals-detail', kwargs={'pk': self.goal.pk})
+        self.assertBudget(1, 'get', url)
+        self.assertBudget(8, 'patch', url, {'title': 'Renamed', 'current_amount': '80.00'})
+        self.assertBudget(4, 'delete', url, expected_status=status.HTTP_204_NO_CONTENT)
+
+    def test_goal_update_amount(self):
+        url = reverse('goals-update-amount', kwargs={'pk': self.goal.pk})
+        self.assertBudget(6, 'patch', url, {'current_amount': '120.00'})
+
+    def test_goal_contributions(self):
+        url = reverse('goals-add-amount', kwargs={'goal_id': self.goal.pk})
+        self.assertBudget(6, 'post', url, {'amount': '15.00'})
+        self.assertBudget(6, 'post', reverse('goals-add-amounts'), [
+            {'goal_id': self.goal.pk, 'amount': '5.00'},
+            {'goal_id': self.other_goal.pk, 'amount': '7.50'},
+        ])
+
+    def test_goal_bulk(self):
+        url = reverse('goals-bulk')
+        rows = [{'title': f'Bulk {index}', 'target_amount': '100.00'} for index in range(5)]
+        self.assertBudget(4, 'post', url, rows, status.HTTP_201_CREATED)
+        self.assertBudget(9, 'patch', url, [
+            {'id': self.goal.pk, 'title': 'Renamed', 'current_amount': '300.00'},
+        ])
+
+    def test_goal_forecasts(self):
+        self.assertBudget(3, 'get', reverse('goals-forecast', kwargs={'pk': self.goal.pk}))
+        self.assertBudget(3, 'get', reverse('goals-forecast-all'))
+
+    def test_goals_summary(self):
+        self.assertBudget(2, 'get', reverse('goals-summary'))
+
+    # Accounts
+
+    def test_register_and_login(self):
+        self.client.force_authenticate(user=None)
+        self.assertBudget(3, 'post', reverse('register'), {
+            'username': 'newuser', 'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User',
+            'password': 'newpass123!', 'password_confirm': 'newpass123!',
+        }, status.HTTP_201_CREATED)
+        credentials = {'email': 'test@example.com', 'password': 'testpass123!'}
+        self.assertBudget(1, 'post', reverse('login'), credentials)
+        self.assertBudget(1, 'post', reverse('token_obtain_pair'), credentials)
+
+    def test_token_refresh_and_logout(self):
+        refresh = UserRefreshToken.for_user(self.user)
+        response = self.assertBudget(4, 'post', reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertBudget(3, 'post', reverse('logout'), {'refresh': response.data['refresh']},
+                          status.HTTP_204_NO_CONTENT)
+
+    def test_bearer_token_reads(self):
+        self.authenticate_with_token()
+        # The first request loads the user, later ones find it in the user cache
+        self.assertBudget(3, 'get', reverse('transaction-list-create'))
+        self.assertBudget(2, 'get', reverse('transaction-list-create'))
+        self.assertBudget(3, 'get', reverse('goals-list-create'))
+        self.assertBudget(0, 'get', reverse('user_profile'))
+
+    def test_bearer_token_writes(self):
+        self.authenticate_with_token()
+        url = reverse('transaction-list-create')
+        # Different categories, so both requests start a new rollup row
+        self.assertBudget(9, 'post', url, {'amount': '12.50', 'type': 'expense', 'category': 'food'},
+                          status.HTTP_201_CREATED)
+        self.assertBudget(8, 'post', url, {'amount': '12.50', 'type': 'expense', 'category': 'rent'},
+                          status.HTTP_201_CREATED)
+
+    def test_bearer_token_profile_update(self):
+        self.authenticate_with_token()
+        self.assertBudget(1, 'get', reverse('user_profile'))
+        # Saving the user retires the cached copy, so the next request loads it again
+        self.assertBudget(1, 'patch', reverse('user_profile'), {'first_name': 'Renamed'})
+        self.assertBudget(1, 'get', reverse('user_profile'))
+        self.assertBudget(0, 'get', reverse('user_profile'))
+
+    @override_settings(AUTH_STATELESS_READS=True)
+    def test_bearer_token_stateless_reads(self):
+        self.authenticate_with_token()
+        # Reads use a user built from the token claims; the profile needs the full record
+        self.assertBudget(2, 'get', reverse('transaction-list-create'))
+        self.assertBudget(1, 'get', reverse('user_profile'))
+
+    def test_profile(self):
+        self.assertBudget(0, 'get', reverse('user_profile'))
+        self.assertBudget(1, 'patch', reverse('user_profile'), {'first_name': 'Renamed'})
+
+    @mock.patch('accounts.views.purge_account_in_background')
+    def test_delete_account(self, purge_in_background):
+        self.assertBudget(7, 'post', reverse('delete_account'), {'password': 'testpass123!'},
+                          status.HTTP_202_ACCEPTED)
+        purge_in_background.assert_called_once()
+
+    def test_admin_stats(self):
+        self.user.is_staff = True
+        self.assertBudget(0, 'get', reverse('hashing_stats'))
+        self.assertBudget(0, 'get', reverse('metrics'))
+
+
+class SingleRowQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    SIZE = 1
+
+
+class HundredRowQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    SIZE = 100
+
+
+class TenThousandRowQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    SIZE = 10000
@@ -0,0 +1,107 @@
+import re
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from goals.models import SavingsGoal
+from transactions.models import Transaction
+from transactions.search import FTS_TABLE
+
+User = get_user_model()
+
+# "SCAN <table>" is a full pass over a table or index; seeks show up as "SEARCH"
+FULL_SCAN = re.compile(r'\bSCAN (\w+)')
+ALLOWED_SCANS = {FTS_TABLE, 'CONSTANT'}
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN checks are written for SQLite')
+class QueryPlanTestCase(TestCase):
+    """Run EXPLAIN QUERY PLAN on every query the hot endpoints issue and fail on full scans"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123!',
+            first_name='Test',
+            last_name='User'
+        )
+        self.client.force_authenticate(user=self.user)
+
+        for day in range(1, 29):
+            Transaction.objects.create(
+                user=self.user,
+                amount=Decimal('10.00') + day,
+                type='expense' if day % 3 else 'income',
+                category='food' if day % 2 else 'transport',
+                description=f'Purchase number {day}',
+                date=date(2024, 1, day)
+            )
+        for target in ('1000.00', '2500.00'):
+            SavingsGoal.objects.create(user=self.user, title='Goal', target_amount=Decimal(target))
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScans(self, url, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+        selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertTrue(selects, f'{url} ran no queries')
+        for sql in selects:
+            plan = self.explain(sql)
+            for line in plan:
+                match = FULL_SCAN.search(line)
+                if match and match.group(1) not in ALLOWED_SCANS:
+                    self.fail(f'{url} {params or ""} scans {match.group(1)}:\n{sql}\n' + '\n'.join(plan))
+            if 'ORDER BY' in sql and 'transactions_transaction' in sql and 'LIMIT' in sql:
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', ' '.join(plan), sql)
+
+    def test_transaction_list_plans(self):
+        url = reverse('transaction-list-create')
+        self.assertNoFullScans(url)
+        self.assertNoFullScans(url, {'type': 'expense'})
+        self.assertNoFullScans(url, {'category': 'food'})
+        self.assertNoFullScans(url, {'start_date': '2024-01-05', 'end_date': '2024-01-20'})
+        self.assertNoFullScans(url, {'q': 'purchase'})
+
+        next_url = self.client.get(url, {'page_size': 5}).data['next']
+        self.assertNoFullScans(next_url)
+
+    def test_transaction_export_plan(self):
+        self.assertNoFullScans(reverse('transaction-export'), {'type': 'income'})
+
+    def test_summary_and_stats_plans(self):
+        self.assertNoFullScans(reverse('monthly-summary'), {'month': 1, 'year': 2024})
+        self.assertNoFullScans(reverse('monthly-summary'), {'from': '2023-06', 'to': '2024-05'})
+        self.assertNoFullScans(reverse('transaction-stats'))
+
+    def test_period_range_plan(self):
+        queryset = Transaction.objects.for_user_period(self.user, date(2024, 1, 1), date(2024, 2, 1))
+        plan = queryset.explain()
+        self.assertIn('SEARCH transactions_transaction USING INDEX', plan)
+        self.assertIn('date>? AND date<?', plan)
+
+    def test_goal_plans(self):
+        self.assertNoFullScans(reverse('goals-list-create'))
+        for ordering in ('progress', '-remaining', 'deadline'):
+            self.assertNoFullScans(reverse('goals-list-create'), {'ordering': ordering})
+        self.assertNoFullScans(reverse('goals-forecast-all'))
+        self.assertNoFullScans(reverse('goals-summary'))
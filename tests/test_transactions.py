@@ -3,14 +3,28 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
-from transactions.models import Transaction
+from django.core.cache import cache
+from accounts.versioning import TRANSACTIONS, get_data_versions
+from transactions.caching import stats_cache_key
+from transactions.models import Transaction, MonthlyRollup, format_currency
+from transactions.search import FTS_TABLE, create_search_index
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
+from datetime import date
+from io import StringIO
+import csv
+import json
+import os
+import tempfile
 
 User = get_user_model()
 
 
 class TransactionsTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(
             username='testuser',
@@ -87,6 +101,12 @@ class TransactionsTestCase(TestCase):
         response = self.client.get(url, {'category': 'food'})
         self.assertEqual(len(response.data['results']), 1)
 
+        # The last representable date is a valid, inclusive end date
+        response = self.client.get(url, {'end_date': '9999-12-31'})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(reverse('transaction-export'), {'end_date': '9999-12-31'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
     def test_monthly_summary(self):
         """Test monthly summary endpoint"""
         # Create transactions for current month
@@ -109,4 +129,385 @@ class TransactionsTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['total_income'], Decimal('1000.00'))
         self.assertEqual(response.data['total_expenses'], Decimal('300.00'))
-        self.assertEqual(response.data['net_savings'], Decimal('700.00'))
\ No newline at end of file
+        self.assertEqual(response.data['net_savings'], Decimal('700.00'))
+
+    def test_monthly_summary_category_breakdown(self):
+        """Test monthly summary totals and category breakdown come from one rollup query"""
+        for amount, category in [('300.00', 'food'), ('200.00', 'food'), ('50.00', 'transport')]:
+            Transaction.objects.create(
+                user=self.user,
+                amount=Decimal(amount),
+                type='expense',
+                category=category
+            )
+
+        url = reverse('monthly-summary')
+        # One query for the data version (ETag), one for the rollups
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transaction_count'], 3)
+        self.assertEqual(response.data['total_expenses'], Decimal('550.00'))
+        self.assertEqual(
+            response.data['category_breakdown'],
+            {'Food': 500.0, 'Transport': 50.0}
+        )
+
+    def test_monthly_summary_range(self):
+        """Test monthly summary over a range of months"""
+        transaction = Transaction.objects.create(
+            user=self.user,
+            amount=Decimal('120.00'),
+            type='income',
+            category='other'
+        )
+        transaction.date = date(2024, 2, 10)
+        transaction.save()
+
+        url = reverse('monthly-summary')
+        response = self.client.get(url, {'from': '2024-01', 'to': '2024-03'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        months = response.data['months']
+        self.assertEqual([m['month'] for m in months], ['January', 'February', 'March'])
+        self.assertEqual(months[0]['total_income'], Decimal('0'))
+        self.assertEqual(months[1]['total_income'], Decimal('120.00'))
+        self.assertEqual(months[1]['transaction_count'], 1)
+
+        # The last representable month works alone and at the end of a range
+        response = self.client.get(url, {'month': 12, 'year': 9999})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, {'from': '9990-01', 'to': '9999-12'})
+        self.assertEqual(len(response.data['months']), 120)
+
+        response = self.client.get(url, {'from': '2024-01', 'to': '9999-12'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {'from': '2024-03', 'to': '2024-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    def test_rollups_follow_updates_and_deletes(self):
+        """Test monthly rollups are maintained through the API"""
+        url = reverse('transaction-list-create')
+        response = self.client.post(url, self.transaction_data)
+        detail_url = reverse('transaction-detail', kwargs={'pk': response.data['id']})
+
+        rollup = MonthlyRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.category, rollup.total, rollup.count), ('food', Decimal('100.50'), 1))
+
+        response = self.client.patch(detail_url, {'amount': '80.00', 'category': 'health'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Rollups emptied by a change are deleted rather than kept at zero
+        totals = {r.category: (r.total, r.count) for r in MonthlyRollup.objects.filter(user=self.user)}
+        self.assertEqual(totals, {'health': (Decimal('80.00'), 1)})
+
+        response = self.client.delete(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(MonthlyRollup.objects.filter(user=self.user).exists())
+
+    def test_rollups_follow_partial_saves(self):
+        """Test saves of deferred instances or with update_fields only count the fields written"""
+        transaction = Transaction.objects.create(
+            user=self.user, amount=Decimal('10.00'), type='expense', category='food'
+        )
+
+        def totals():
+            return {r.category: (r.total, r.count) for r in MonthlyRollup.objects.filter(user=self.user)}
+
+        transaction.amount = Decimal('20.00')
+        transaction.description = 'Lunch'
+        transaction.save(update_fields=['description'])
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.amount, Decimal('10.00'))
+        self.assertEqual(totals(), {'food': (Decimal('10.00'), 1)})
+
+        transaction.amount = Decimal('20.00')
+        transaction.category = 'health'
+        transaction.save(update_fields=['amount'])
+        self.assertEqual(totals(), {'food': (Decimal('20.00'), 1)})
+
+        deferred = Transaction.objects.only('id', 'user', 'category').get(pk=transaction.pk)
+        deferred.category = 'health'
+        deferred.save()
+        self.assertEqual(totals(), {'health': (Decimal('20.00'), 1)})
+
+        deferred = Transaction.objects.defer('amount', 'category').get(pk=transaction.pk)
+        deferred.description = 'Dinner'
+        deferred.save()
+        self.assertEqual(totals(), {'health': (Decimal('20.00'), 1)})
+
+    def test_rebuild_rollups_command(self):
+        """Test rebuilding rollups from raw transactions"""
+        for amount, kind in [('40.00', 'expense'), ('60.00', 'expense'), ('500.00', 'income')]:
+            Transaction.objects.create(user=self.user, amount=Decimal(amount), type=kind, category='other')
+        MonthlyRollup.objects.all().delete()
+
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        totals = {r.type: (r.total, r.count) for r in MonthlyRollup.objects.filter(user=self.user)}
+        self.assertEqual(totals, {
+            'expense': (Decimal('100.00'), 2),
+            'income': (Decimal('500.00'), 1),
+        })
+
+    def test_transaction_stats(self):
+        """Test transaction statistics are read from the rollups"""
+        for amount, kind, category in [
+            ('1000.00', 'income', 'other'),
+            ('30.00', 'expense', 'food'),
+            ('20.00', 'expense', 'food'),
+        ]:
+            Transaction.objects.create(user=self.user, amount=Decimal(amount), type=kind, category=category)
+
+        url = reverse('transaction-stats')
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_transactions'], 3)
+        self.assertEqual(response.data['total_income'], Decimal('1000.00'))
+        self.assertEqual(response.data['total_expenses'], Decimal('50.00'))
+        self.assertEqual(response.data['most_used_category'], 'food')
+
+    def test_transaction_cursor_pagination(self):
+        """Test walking the transaction list forwards and backwards by cursor"""
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, amount=Decimal(i + 1), type='expense', category='food')
+            for i in range(45)
+        ])
+        Transaction.objects.create(user=self.user, amount=Decimal('5.00'), type='income', category='other')
+
+        url = reverse('transaction-list-create')
+        seen = []
+        pages = []
+        next_url = f'{url}?type=expense'
+        while next_url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(next_url)
+            self.assertNotIn('count', response.data)
+            for query in queries.captured_queries:
+                self.assertNotIn('COUNT(', query['sql'])
+                self.assertNotIn('OFFSET', query['sql'])
+            pages.append(response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            next_url = response.data['next']
+
+        self.assertEqual([len(page['results']) for page in pages], [20, 20, 5])
+        self.assertEqual(len(set(seen)), 45)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertIsNone(pages[0]['previous'])
+
+        response = self.client.get(pages[2]['previous'])
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [row['id'] for row in pages[1]['results']]
+        )
+
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_transactions(self):
+        """Test streaming CSV and NDJSON exports honour the list filters"""
+        Transaction.objects.create(user=self.user, amount=Decimal('50.00'), type='income', category='other')
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('25.00'), type='expense', category='food', description='Lunch, with tip'
+        )
+
+        url = reverse('transaction-export')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'date', 'type', 'category', 'amount', 'description', 'created_at'])
+        self.assertEqual(len(rows), 3)
+        self.assertIn('Lunch, with tip', rows[1])
+
+        response = self.client.get(url, {'fmt': 'ndjson', 'type': 'expense'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record['amount'], '25.00')
+        self.assertEqual(record['category'], 'food')
+
+        response = self.client.get(url, {'fmt': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_import_transactions(self):
+        """Test posting a JSON array imports valid rows and reports invalid ones"""
+        url = reverse('transaction-list-create')
+        rows = [
+            {'amount': '1200.00', 'type': 'expense', 'category': 'rent', 'date': '2023-05-01'},
+            {'amount': '-5.00', 'type': 'expense', 'category': 'food'},
+            {'amount': '3000.00', 'type': 'income', 'category': 'other', 'date': '2023-05-28'},
+            {'amount': '10.00', 'type': 'gift', 'category': 'other'},
+        ]
+        response = self.client.post(url, rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 3])
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('date', flat=True)),
+            [date(2023, 5, 1), date(2023, 5, 28)]
+        )
+
+        response = self.client.get(reverse('monthly-summary'), {'month': 5, 'year': 2023})
+        self.assertEqual(response.data['total_income'], Decimal('3000.00'))
+        self.assertEqual(response.data['total_expenses'], Decimal('1200.00'))
+
+    def test_import_transactions_command(self):
+        """Test importing transactions from a CSV file"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('amount,type,category,description,date\n')
+            csv_file.write('45.10,expense,food,Groceries,2022-11-03\n')
+            csv_file.write('abc,expense,food,,2022-11-04\n')
+            csv_file.write('900.00,income,other,,2022-11-30\n')
+        self.addCleanup(os.remove, csv_file.name)
+
+        stderr = StringIO()
+        call_command('import_transactions', csv_file.name, user='test@example.com',
+                     stdout=StringIO(), stderr=stderr)
+
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.assertIn('Line 3', stderr.getvalue())
+        rollups = MonthlyRollup.objects.filter(user=self.user, month=date(2022, 11, 1))
+        self.assertEqual(sum(r.count for r in rollups), 2)
+
+    def test_list_and_detail_do_not_query_owner(self):
+        """Test the owner name comes from the request rather than a query per row"""
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, amount=Decimal('1234.5'), type='expense', category='rent')
+            for _ in range(15)
+        ])
+
+        # One query for the data version (ETag), one for the page
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('transaction-list-create'))
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertEqual(response.data['results'][0]['user_name'], 'Test User')
+        self.assertEqual(response.data['results'][0]['formatted_amount'], '$1,234.50')
+
+        pk = response.data['results'][0]['id']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('transaction-detail', kwargs={'pk': pk}))
+        self.assertEqual(response.data['user_name'], 'Test User')
+
+    def test_list_formats_amounts_like_detail(self):
+        """Test amounts formatted in SQL for the list match the Python formatting"""
+        amounts = ['0.01', '0.10', '9.99', '100.00', '1000.05', '1234567.89', '99999999.99']
+        for amount in amounts:
+            Transaction.objects.create(user=self.user, amount=Decimal(amount), type='expense', category='food')
+
+        response = self.client.get(reverse('transaction-list-create'))
+        formatted = {row['amount']: row['formatted_amount'] for row in response.data['results']}
+        self.assertEqual(formatted, {amount: format_currency(Decimal(amount)) for amount in amounts})
+
+    def test_etag_not_modified_until_write(self):
+        """Test read endpoints answer 304 until the user's transactions change"""
+        Transaction.objects.create(user=self.user, amount=Decimal('10.00'), type='expense', category='food')
+
+        for url in [reverse('transaction-list-create'), reverse('monthly-summary'), reverse('transaction-stats')]:
+            response = self.client.get(url)
+            etag = response['ETag']
+
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            Transaction.objects.create(user=self.user, amount=Decimal('1.00'), type='expense', category='food')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+        # Renaming the user changes the user_name shown in every row
+        url = reverse('transaction-list-create')
+        etag = self.client.get(url)['ETag']
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['user_name'], 'Renamed User')
+
+    def test_summary_and_stats_are_cached_until_write(self):
+        """Test summaries and stats are served from cache and invalidated on write"""
+        Transaction.objects.create(user=self.user, amount=Decimal('10.00'), type='expense', category='food')
+
+        summary_url = reverse('monthly-summary')
+        stats_url = reverse('transaction-stats')
+        self.client.get(summary_url)
+        self.client.get(stats_url)
+
+        # Only the data version lookup for the ETag remains
+        with self.assertNumQueries(1):
+            response = self.client.get(summary_url)
+        self.assertEqual(response.data['total_expenses'], Decimal('10.00'))
+        with self.assertNumQueries(1):
+            self.client.get(stats_url)
+
+        version = get_data_versions(self.user.pk, [TRANSACTIONS])[0]
+        Transaction.objects.create(user=self.user, amount=Decimal('5.00'), type='expense', category='food')
+        # A read racing the write may re-cache old figures, but only under the old version
+        cache.set(stats_cache_key(self.user.pk, version), {'total_transactions': 1})
+        self.assertEqual(self.client.get(summary_url).data['total_expenses'], Decimal('15.00'))
+        self.assertEqual(self.client.get(stats_url).data['total_transactions'], 2)
+
+    def test_search_transactions(self):
+        """Test full-text search over descriptions stays in sync with writes"""
+        other_user = User.objects.create_user(
+            username='otheruser', email='other@example.com', password='testpass123!',
+            first_name='Other', last_name='User'
+        )
+        grocery = Transaction.objects.create(
+            user=self.user, amount=Decimal('40.00'), type='expense', category='food',
+            description='Weekly grocery run'
+        )
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('12.00'), type='expense', category='transport',
+            description='Bus ticket'
+        )
+        Transaction.objects.create(
+            user=other_user, amount=Decimal('40.00'), type='expense', category='food',
+            description='Grocery haul'
+        )
+
+        self.assertIn(FTS_TABLE, connection.introspection.table_names())
+        url = reverse('transaction-list-create')
+        response = self.client.get(url, {'q': 'groc'})
+        self.assertEqual([row['id'] for row in response.data['results']], [grocery.id])
+
+        response = self.client.get(url, {'q': 'weekly "bus'})
+        self.assertEqual(response.data['results'], [])
+
+        grocery.description = 'Farmers market'
+        grocery.save()
+        self.assertEqual(self.client.get(url, {'q': 'grocery'}).data['results'], [])
+        self.assertEqual(len(self.client.get(url, {'q': 'market'}).data['results']), 1)
+
+        # Matches are narrowed to the user inside the index
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH 'grocery' AND user_id = %s",
+                           [other_user.pk])
+            self.assertEqual(len(cursor.fetchall()), 1)
+
+    def test_search_index_without_user_column_is_rebuilt(self):
+        """Test an index created before the user_id column is replaced on migrate"""
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('40.00'), type='expense', category='food',
+            description='Weekly grocery run'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {FTS_TABLE}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"description, content='transactions_transaction', content_rowid='id')"
+            )
+        create_search_index(using='default')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA table_info({FTS_TABLE})")
+            self.assertIn('user_id', [row[1] for row in cursor.fetchall()])
+        response = self.client.get(reverse('transaction-list-create'), {'q': 'groc'})
+        self.assertEqual(len(response.data['results']), 1)
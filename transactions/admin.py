@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Transaction
+from .models import Transaction, MonthlyRollup
 
 
 @admin.register(Transaction)
@@ -18,4 +18,13 @@ class TransactionAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(MonthlyRollup)
+class MonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'month', 'type', 'category', 'total', 'count')
+    list_filter = ('type', 'category', 'month')
+    search_fields = ('user__username', 'user__email')
+    ordering = ('-month',)
+    readonly_fields = ('user', 'month', 'type', 'category', 'total', 'count')
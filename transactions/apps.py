@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'transactions'
\ No newline at end of file
+    name = 'transactions'
+
+    def ready(self):
+        from .search import create_search_index
+        post_migrate.connect(create_search_index, sender=self)
@@ -0,0 +1,13 @@
+"""Cache keys of the transaction summaries and stats.
+
+Keys include the user's transactions data version, so a write makes every
+older entry unreachable; stale entries simply expire.
+"""
+
+
+def summary_cache_key(user_id, version, month):
+    return f'transactions:summary:{user_id}:{version}:{month:%Y-%m}'
+
+
+def stats_cache_key(user_id, version):
+    return f'transactions:stats:{user_id}:{version}'
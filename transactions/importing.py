@@ -0,0 +1,63 @@
+from itertools import islice
+
+from django.db import router, transaction
+from rest_framework import serializers
+
+from accounts.versioning import TRANSACTIONS, bump_data_version
+
+from .models import MonthlyRollup, Transaction
+from .serializers import TransactionImportSerializer
+
+IMPORT_BATCH_SIZE = 500
+
+
+def import_transactions(user, rows, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and insert transaction rows for ``user``.
+
+    ``rows`` may be any iterable of dicts and is consumed in batches, so large
+    files can be streamed through. Valid rows are written with ``bulk_create``
+    and the monthly rollups adjusted, all in one database transaction; invalid
+    rows are skipped and reported.
+
+    Returns ``(created, errors)`` where ``errors`` is a list of
+    ``{'row': index, 'errors': {...}}`` with zero-based row indexes.
+    """
+    validator = TransactionImportSerializer()
+    rows = iter(rows)
+    created = 0
+    errors = []
+    deltas = {}
+    index = 0
+
+    using = router.db_for_write(Transaction)
+    with transaction.atomic(using=using):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            valid = []
+            for row in batch:
+                try:
+                    validated = validator.run_validation(row)
+                except serializers.ValidationError as exc:
+                    errors.append({'row': index, 'errors': exc.detail})
+                else:
+                    valid.append(Transaction(user=user, **validated))
+                index += 1
+
+            Transaction.objects.bulk_create(valid, batch_size=batch_size)
+            for instance in valid:
+                MonthlyRollup.add_delta(
+                    deltas,
+                    (instance.date.replace(day=1), instance.type, instance.category),
+                    instance.amount,
+                    1,
+                )
+            created += len(valid)
+
+        MonthlyRollup.apply(user.pk, deltas, using=using)
+        if created:
+            bump_data_version(user.pk, TRANSACTIONS, using=using)
+
+    return created, errors
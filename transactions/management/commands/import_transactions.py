@@ -0,0 +1,50 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budget_tracker.sharding import user_shard
+from transactions.importing import IMPORT_BATCH_SIZE, import_transactions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Import transactions for a user from a CSV file with the columns '
+        'amount, type, category, description and date (YYYY-MM-DD)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the CSV file')
+        parser.add_argument('--user', required=True, help='Email of the user owning the transactions')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Number of rows validated and inserted per batch',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+
+        try:
+            csv_file = open(options['csv_file'], newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f'Cannot open {options["csv_file"]}: {exc}')
+
+        with csv_file, user_shard(user.pk):
+            rows = (
+                {key: value for key, value in row.items()
+                 if key is not None and value not in ('', None)}
+                for row in csv.DictReader(csv_file)
+            )
+            created, errors = import_transactions(user, rows, batch_size=options['batch_size'])
+
+        for error in errors:
+            # Row indexes are zero-based and the header takes the first line
+            self.stderr.write(f"Line {error['row'] + 2}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} transactions, skipped {len(errors)} invalid rows'
+        ))
@@ -0,0 +1,68 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from accounts.versioning import TRANSACTIONS, bump_data_version
+from budget_tracker.sharding import data_aliases, using_shard
+from transactions.models import MonthlyRollup, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly transaction rollups from the raw transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', dest='user_ids', type=int, action='append',
+            help='Only rebuild rollups for this user id (may be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rollup rows inserted per query',
+        )
+
+    def handle(self, *args, **options):
+        created = 0
+        for alias in data_aliases():
+            with using_shard(alias):
+                created += self.rebuild(options['user_ids'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} monthly rollup rows'))
+
+    def rebuild(self, user_ids, batch_size):
+        """Rebuild the rollups on the current shard; returns the rows created"""
+        rollups = MonthlyRollup.objects.all()
+        transactions = Transaction.objects.all()
+        if user_ids:
+            rollups = rollups.filter(user_id__in=user_ids)
+            transactions = transactions.filter(user_id__in=user_ids)
+
+        rows = (
+            transactions
+            .annotate(month=TruncMonth('date'))
+            .values('user_id', 'month', 'type', 'category')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by()
+        )
+
+        created = 0
+        # Users whose cached summaries may change
+        touched = set()
+        using = router.db_for_write(MonthlyRollup)
+        with transaction.atomic(using=using):
+            touched.update(rollups.values_list('user_id', flat=True).distinct().iterator())
+            rollups.delete()
+
+            iterator = (MonthlyRollup(**row) for row in rows.iterator(chunk_size=batch_size))
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                MonthlyRollup.objects.bulk_create(batch, batch_size=batch_size)
+                created += len(batch)
+                touched.update(rollup.user_id for rollup in batch)
+
+            for user_id in touched:
+                bump_data_version(user_id, TRANSACTIONS, using=using)
+        return created
@@ -1,10 +1,48 @@
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import CharField, F, Func
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+import datetime
+
+from accounts.versioning import TRANSACTIONS, bump_data_version
 
 User = get_user_model()
 
+# Fields of a transaction that decide which MonthlyRollup row it counts towards, and by how much
+ROLLUP_FIELDS = ('date', 'type', 'category', 'amount')
+
+
+def format_currency(amount):
+    """Format an amount as ``$1,234.56``"""
+    return f"${amount:,.2f}"
+
+
+class CurrencyText(Func):
+    """``format_currency`` of a positive money column, computed by the database"""
+    output_field = CharField()
+    # Whole cents, split into comma-grouped dollars and two-digit cents
+    template = (
+        "printf('$%%%%,d.%%%%02d', CAST(ROUND(%(expressions)s * 100) AS INTEGER) / 100, "
+        "CAST(ROUND(%(expressions)s * 100) AS INTEGER) %%%% 100)"
+    )
+
+
+class TransactionQuerySet(models.QuerySet):
+    def for_user_period(self, user, start=None, end=None):
+        """Transactions of ``user`` dated in the half-open range ``[start, end)``.
+
+        Either bound may be omitted. Plain range comparisons on ``date`` (never
+        ``date__month``/``date__year``) keep the filter sargable, so it seeks the
+        ``(user, -date, ...)`` index instead of scanning the user's rows.
+        """
+        queryset = self.filter(user=user)
+        if start is not None:
+            queryset = queryset.filter(date__gte=start)
+        if end is not None:
+            queryset = queryset.filter(date__lt=end)
+        return queryset
+
 
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
@@ -22,7 +60,8 @@ class Transaction(models.Model):
         ('other', 'Other'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
+    # No database-level constraint: with sharding the user row is on another database
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions', db_constraint=False)
     amount = models.DecimalField(
         max_digits=10, 
         decimal_places=2, 
@@ -31,21 +70,138 @@ class Transaction(models.Model):
     type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     category = models.CharField(max_length=20, choices=CATEGORIES)
     description = models.TextField(blank=True, null=True)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=datetime.date.today)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date', '-created_at']
         indexes = [
-            models.Index(fields=['user', 'date']),
-            models.Index(fields=['user', 'type']),
-            models.Index(fields=['user', 'category']),
+            # Also serves date range filters; aggregates read MonthlyRollup instead
+            models.Index(fields=['user', '-date', '-created_at', '-id']),
+            models.Index(fields=['user', 'type', 'date']),
+            models.Index(fields=['user', 'category', 'date']),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.type} - ${self.amount} - {self.date}"
 
+    def _rollup_entry(self, values):
+        """Return ``(rollup_key, amount)`` for a mapping of the rollup fields to their values"""
+        date, type, category, amount = (
+            self._meta.get_field(name).to_python(values[name]) for name in ROLLUP_FIELDS
+        )
+        return (date.replace(day=1), type, category), amount
+
+    def _stored_rollup_values(self, using):
+        """Return the rollup fields of the row as it is stored, locking it where the database can.
+
+        Read inside the write's transaction rather than remembered from when the
+        instance was loaded, so concurrent updates cannot make the rollups drift.
+        """
+        return Transaction.objects.using(using).select_for_update().filter(pk=self.pk).values(
+            *ROLLUP_FIELDS
+        ).first()
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            written = set(ROLLUP_FIELDS).intersection(update_fields)
+        else:
+            # Django only writes the loaded fields of a deferred instance
+            written = set(ROLLUP_FIELDS) - self.get_deferred_fields()
+
+        with transaction.atomic(using=using):
+            if not written:
+                # e.g. save(update_fields=['description']) leaves the rollups as they are
+                super().save(*args, **kwargs)
+            else:
+                stored = None if self._state.adding else self._stored_rollup_values(using)
+                super().save(*args, **kwargs)
+                deltas = {}
+                if stored is None:
+                    current = {name: getattr(self, name) for name in ROLLUP_FIELDS}
+                else:
+                    previous = self._rollup_entry(stored)
+                    MonthlyRollup.add_delta(deltas, previous[0], -previous[1], -1)
+                    # Fields the save left out keep their stored values
+                    current = {**stored, **{name: getattr(self, name) for name in written}}
+                current = self._rollup_entry(current)
+                MonthlyRollup.add_delta(deltas, current[0], current[1], 1)
+                MonthlyRollup.apply(self.user_id, deltas, using=using)
+            bump_data_version(self.user_id, TRANSACTIONS, using=using)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            stored = self._stored_rollup_values(using)
+            result = super().delete(*args, **kwargs)
+            if stored is not None:
+                previous = self._rollup_entry(stored)
+                MonthlyRollup.apply(
+                    self.user_id, {previous[0]: [-previous[1], -1]}, using=using
+                )
+            bump_data_version(self.user_id, TRANSACTIONS, using=using)
+        return result
+
     @property
     def formatted_amount(self):
-        return f"${self.amount:,.2f}"
\ No newline at end of file
+        return format_currency(self.amount)
+
+
+class MonthlyRollup(models.Model):
+    """Running total and count of a user's transactions per month, type and category.
+
+    Kept up to date by ``Transaction.save``/``delete`` in the same database
+    transaction, and rebuilt from scratch by ``manage.py rebuild_rollups``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups', db_constraint=False)
+    month = models.DateField(help_text='First day of the month')
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=20, choices=Transaction.CATEGORIES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['month', 'type', 'category']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'type', 'category'],
+                name='unique_monthly_rollup',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.month:%Y-%m} - {self.type} - {self.category}"
+
+    @staticmethod
+    def add_delta(deltas, key, amount, count):
+        """Accumulate an ``(amount, count)`` change for ``(month, type, category)`` into ``deltas``"""
+        delta = deltas.setdefault(key, [Decimal('0.00'), 0])
+        delta[0] += amount
+        delta[1] += count
+
+    @classmethod
+    def apply(cls, user_id, deltas, using=None):
+        """Apply accumulated deltas for one user, creating missing rows and deleting emptied ones"""
+        manager = cls.objects.db_manager(using)
+        for (month, type, category), (amount, count) in deltas.items():
+            if not amount and not count:
+                continue
+            rows = manager.filter(user_id=user_id, month=month, type=type, category=category)
+            if rows.update(total=F('total') + amount, count=F('count') + count):
+                if count < 0:
+                    rows.filter(count__lte=0).delete()
+                continue
+            try:
+                with transaction.atomic(using=manager.db):
+                    manager.create(
+                        user_id=user_id, month=month, type=type, category=category,
+                        total=amount, count=count,
+                    )
+            except IntegrityError:
+                # Created concurrently since the update above; apply on top of it
+                rows.update(total=F('total') + amount, count=F('count') + count)
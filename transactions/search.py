@@ -0,0 +1,102 @@
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import Transaction
+
+FTS_TABLE = 'transactions_transaction_fts'
+
+_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        AFTER INSERT ON transactions_transaction BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, description, user_id) VALUES (new.id, new.description, new.user_id);
+        END""",
+    f'{FTS_TABLE}_ad': f"""
+        AFTER DELETE ON transactions_transaction BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, user_id)
+            VALUES ('delete', old.id, old.description, old.user_id);
+        END""",
+    f'{FTS_TABLE}_au': f"""
+        AFTER UPDATE OF description, user_id ON transactions_transaction BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, user_id)
+            VALUES ('delete', old.id, old.description, old.user_id);
+            INSERT INTO {FTS_TABLE}(rowid, description, user_id) VALUES (new.id, new.description, new.user_id);
+        END""",
+}
+
+# Aliases whose database has the full-text index, filled in lazily
+_fts_available = {}
+
+
+def create_search_index(sender=None, using='default', **kwargs):
+    """Create the FTS5 index over transaction descriptions (``post_migrate`` handler).
+
+    The index is an external-content FTS5 table kept in sync by triggers, so
+    every write path (ORM, ``bulk_create``, raw SQL) updates it. It also
+    stores ``user_id``, unindexed, so matches are narrowed to one user's rows
+    inside the index. An index from before that column is rebuilt. Backends
+    other than SQLite, or SQLite builds without FTS5, are left alone and
+    searches fall back to a ``LIKE`` scan.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if Transaction._meta.db_table not in tables:
+            return
+
+        if FTS_TABLE in tables:
+            cursor.execute(f"PRAGMA table_info({FTS_TABLE})")
+            if 'user_id' not in {row[1] for row in cursor.fetchall()}:
+                for name in _TRIGGERS:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(f"DROP TABLE {FTS_TABLE}")
+                tables.remove(FTS_TABLE)
+
+        if FTS_TABLE not in tables:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"description, user_id UNINDEXED, content='transactions_transaction', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            # Index rows that existed before the table was created
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+        for name, body in _TRIGGERS.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    _fts_available[using] = True
+
+
+def _has_search_index(using):
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def search_transactions(queryset, query, user):
+    """Restrict ``queryset`` of ``user``'s transactions to descriptions matching every word of ``query``.
+
+    Words match as prefixes, so partial input works while the user types.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset
+
+    if _has_search_index(queryset.db):
+        # Quote each word so user input cannot use FTS5 query syntax
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND user_id = %s", (match, user.pk)
+        ))
+
+    for word in words:
+        queryset = queryset.filter(description__icontains=word)
+    return queryset
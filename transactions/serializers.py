@@ -1,10 +1,11 @@
 from rest_framework import serializers
-from .models import Transaction
+from budget_tracker.metrics import ProfiledSerializerMixin
+from .models import Transaction, format_currency
 
 
-class TransactionSerializer(serializers.ModelSerializer):
-    formatted_amount = serializers.ReadOnlyField()
-    user_name = serializers.CharField(source='user.full_name', read_only=True)
+class TransactionSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
+    formatted_amount = serializers.SerializerMethodField()
+    user_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Transaction
@@ -12,19 +13,39 @@ class TransactionSerializer(serializers.ModelSerializer):
             'id', 'amount', 'type', 'category', 'description', 
             'date', 'formatted_amount', 'user_name', 'created_at', 'updated_at'
         ]
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'date', 'created_at', 'updated_at')
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+    def get_formatted_amount(self, obj):
+        # List views format the amount in SQL (see CurrencyText)
+        if hasattr(obj, 'amount_text'):
+            return obj.amount_text
+        return format_currency(obj.amount)
 
-class TransactionSummarySerializer(serializers.Serializer):
+    def get_user_name(self, obj):
+        # Views put the owner's name in the context to avoid a user query per row
+        if 'owner_name' in self.context:
+            return self.context['owner_name']
+        return obj.user.full_name
+
+
+class TransactionImportSerializer(serializers.ModelSerializer):
+    """Validates one row of a bulk import, where the transaction date may be given"""
+
+    class Meta:
+        model = Transaction
+        fields = ['amount', 'type', 'category', 'description', 'date']
+
+
+class TransactionSummarySerializer(ProfiledSerializerMixin, serializers.Serializer):
     month = serializers.CharField()
     year = serializers.IntegerField()
-    total_income = serializers.DecimalField(max_digits=10, decimal_places=2)
-    total_expenses = serializers.DecimalField(max_digits=10, decimal_places=2)
-    net_savings = serializers.DecimalField(max_digits=10, decimal_places=2)
+    total_income = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    total_expenses = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    net_savings = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
     transaction_count = serializers.IntegerField()
     
     # Category breakdown
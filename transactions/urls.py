@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('transactions/', views.TransactionListCreateView.as_view(), name='transaction-list-create'),
+    path('transactions/export/', views.export_transactions, name='transaction-export'),
     path('transactions/<int:pk>/', views.TransactionDetailView.as_view(), name='transaction-detail'),
     path('summary/monthly/', views.monthly_summary, name='monthly-summary'),
     path('transactions/stats/', views.transaction_stats, name='transaction-stats'),
@@ -2,57 +2,110 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Sum, Q, Count
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import calendar
-from .models import Transaction
+import csv
+import itertools
+import json
+from accounts.mixins import OwnerNameContextMixin
+from accounts.versioning import TRANSACTIONS, DataVersionETagMixin, etag_on_data_version, request_data_version
+from budget_tracker.replicas import replica_reads
+from .caching import stats_cache_key, summary_cache_key
+from .importing import import_transactions
+from .models import CurrencyText, Transaction, MonthlyRollup
+from .pagination import TransactionCursorPagination
+from .search import search_transactions
 from .serializers import TransactionSerializer, TransactionSummarySerializer
 
+EXPORT_FIELDS = ('id', 'date', 'type', 'category', 'amount', 'description', 'created_at')
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Longest from/to range of the monthly summary, in months
+MAX_SUMMARY_MONTHS = 120
 
-class TransactionListCreateView(generics.ListCreateAPIView):
+
+def filter_transactions(user, query_params):
+    """Apply the date range, type, category and search filters shared by the list and export views"""
+    # Filter by date range, end date inclusive
+    start_date = query_params.get('start_date')
+    end_date = query_params.get('end_date')
+    start = end = None
+
+    if start_date:
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+
+    if end_date:
+        try:
+            end = datetime.strptime(end_date, '%Y-%m-%d').date() + timedelta(days=1)
+        except ValueError:
+            pass
+        except OverflowError:
+            # 9999-12-31 has no next day and excludes nothing
+            pass
+
+    queryset = Transaction.objects.for_user_period(user, start, end)
+
+    # Filter by type
+    transaction_type = query_params.get('type')
+    if transaction_type:
+        queryset = queryset.filter(type=transaction_type)
+    
+    # Filter by category
+    category = query_params.get('category')
+    if category:
+        queryset = queryset.filter(category=category)
+
+    # Full-text search over descriptions
+    query = query_params.get('q')
+    if query:
+        queryset = search_transactions(queryset, query, user)
+    
+    return queryset
+
+
+class TransactionListCreateView(DataVersionETagMixin, OwnerNameContextMixin, generics.ListCreateAPIView):
     """List all transactions for the authenticated user or create a new transaction"""
+    etag_scopes = (TRANSACTIONS,)
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    pagination_class = TransactionCursorPagination
 
     def get_queryset(self):
-        queryset = Transaction.objects.filter(user=self.request.user)
-        
-        # Filter by type
-        transaction_type = self.request.query_params.get('type')
-        if transaction_type:
-            queryset = queryset.filter(type=transaction_type)
-        
-        # Filter by category
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        
-        if start_date:
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__gte=start_date)
-            except ValueError:
-                pass
-        
-        if end_date:
-            try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__lte=end_date)
-            except ValueError:
-                pass
-        
-        return queryset
-
-
-class TransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
+        return filter_transactions(self.request.user, self.request.query_params).annotate(
+            amount_text=CurrencyText('amount')
+        )
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        # A JSON array is a bulk import: keep the valid rows, report the rest
+        created, errors = import_transactions(request.user, request.data)
+        return Response(
+            {'created': created, 'errors': errors},
+            status=status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class TransactionDetailView(OwnerNameContextMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a specific transaction"""
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     # def get_queryset(self):
     #     return Transaction.objects.filter(user=self.request.user)
@@ -63,97 +116,253 @@ class TransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
+def _parse_year_month(value):
+    """Parse a ``YYYY-MM`` string into the first day of that month"""
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def _next_month(day):
+    """Return the first day of the month following ``day``"""
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def _months(first_month, last_month):
+    """Yield the first day of every month in [first_month, last_month].
+
+    The month after ``last_month`` is never computed, so December 9999 works.
+    """
+    period = first_month
+    yield period
+    while period < last_month:
+        period = _next_month(period)
+        yield period
+
+
+def _summarize_months(user, first_month, last_month):
+    """Build monthly summaries for every month in [first_month, last_month].
+
+    All figures come from a single query over the user's monthly rollups, so
+    the cost depends on the number of months rather than transactions.
+    """
+    rows = MonthlyRollup.objects.filter(
+        user=user, month__gte=first_month, month__lte=last_month
+    ).values('month', 'type', 'category', 'total', 'count')
+
+    totals = {}
+    for period in _months(first_month, last_month):
+        totals[period] = {
+            'income': Decimal('0'),
+            'expense': Decimal('0'),
+            'count': 0,
+            'categories': {},
+        }
+
+    for row in rows:
+        bucket = totals[row['month']]
+        bucket[row['type']] += row['total']
+        bucket['count'] += row['count']
+        if row['type'] == 'expense':
+            bucket['categories'][row['category']] = row['total']
+
+    summaries = []
+    for period, bucket in totals.items():
+        # Category breakdown for expenses, in the order categories are declared
+        category_breakdown = {
+            category_name: float(bucket['categories'][category_code])
+            for category_code, category_name in Transaction.CATEGORIES
+            if bucket['categories'].get(category_code, 0) > 0
+        }
+        summaries.append({
+            'month': calendar.month_name[period.month],
+            'year': period.year,
+            'total_income': bucket['income'],
+            'total_expenses': bucket['expense'],
+            'net_savings': bucket['income'] - bucket['expense'],
+            'transaction_count': bucket['count'],
+            'category_breakdown': category_breakdown,
+        })
+    return summaries
+
+
+def _cached_summaries(user, version, first_month, last_month):
+    """Return monthly summaries from the cache, computing the range on any miss"""
+    keys = [summary_cache_key(user.pk, version, period) for period in _months(first_month, last_month)]
+
+    cached = cache.get_many(keys)
+    if len(cached) == len(keys):
+        return [cached[key] for key in keys]
+
+    summaries = _summarize_months(user, first_month, last_month)
+    cache.set_many(dict(zip(keys, summaries)))
+    return summaries
+
+
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_on_data_version(TRANSACTIONS)
 def monthly_summary(request):
-    """Get monthly summary of income, expenses, and savings"""
+    """Get monthly summary of income, expenses, and savings.
+
+    Pass ``month``/``year`` for a single month (defaults to the current one),
+    or ``from=YYYY-MM&to=YYYY-MM`` to get every month in that range at once.
+    """
     user = request.user
-    
+
+    range_from = request.query_params.get('from')
+    range_to = request.query_params.get('to')
+    if range_from or range_to:
+        try:
+            first_month = _parse_year_month(range_from)
+            last_month = _parse_year_month(range_to)
+        except (ValueError, TypeError):
+            return Response(
+                {'error': 'Invalid from or to parameter, expected YYYY-MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if first_month > last_month:
+            return Response(
+                {'error': 'from must not be after to'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        months = (last_month.year - first_month.year) * 12 + last_month.month - first_month.month + 1
+        if months > MAX_SUMMARY_MONTHS:
+            return Response(
+                {'error': f'The range must not span more than {MAX_SUMMARY_MONTHS} months'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        summaries = _cached_summaries(user, request_data_version(request, TRANSACTIONS), first_month, last_month)
+        serializer = TransactionSummarySerializer(summaries, many=True)
+        return Response({
+            'from': range_from,
+            'to': range_to,
+            'months': serializer.data,
+        })
+
     # Get month and year from query params, default to current month
     month = request.query_params.get('month', timezone.now().month)
     year = request.query_params.get('year', timezone.now().year)
-    
+
     try:
         month = int(month)
         year = int(year)
+        period = date(year, month, 1)
     except (ValueError, TypeError):
         return Response(
             {'error': 'Invalid month or year parameter'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
-    
-    # Filter transactions for the specified month and year
-    transactions = Transaction.objects.filter(
-        user=user,
-        date__month=month,
-        date__year=year
-    )
-    
-    # Calculate totals
-    income_total = transactions.filter(type='income').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    expense_total = transactions.filter(type='expense').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    net_savings = income_total - expense_total
-    transaction_count = transactions.count()
-    
-    # Category breakdown for expenses
-    category_breakdown = {}
-    for category_code, category_name in Transaction.CATEGORIES:
-        category_total = transactions.filter(
-            type='expense', 
-            category=category_code
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        if category_total > 0:
-            category_breakdown[category_name] = float(category_total)
-    
-    # Prepare response data
-    summary_data = {
-        'month': calendar.month_name[month],
-        'year': year,
-        'total_income': income_total,
-        'total_expenses': expense_total,
-        'net_savings': net_savings,
-        'transaction_count': transaction_count,
-        'category_breakdown': category_breakdown
-    }
-    
+
+    summary_data = _cached_summaries(user, request_data_version(request, TRANSACTIONS), period, period)[0]
     serializer = TransactionSummarySerializer(summary_data)
     return Response(serializer.data)
 
 
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_on_data_version(TRANSACTIONS)
 def transaction_stats(request):
     """Get overall transaction statistics for the user"""
     user = request.user
-    
-    total_transactions = Transaction.objects.filter(user=user).count()
-    total_income = Transaction.objects.filter(
-        user=user, type='income'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_expenses = Transaction.objects.filter(
-        user=user, type='expense'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
+
+    key = stats_cache_key(user.pk, request_data_version(request, TRANSACTIONS))
+    stats = cache.get(key)
+    if stats is not None:
+        return Response(stats)
+
+    rows = MonthlyRollup.objects.filter(user=user).values('type', 'category').annotate(
+        total=Sum('total'),
+        count=Sum('count')
+    ).order_by()
+
+    total_transactions = 0
+    totals = {'income': Decimal('0'), 'expense': Decimal('0')}
+    category_counts = {}
+    for row in rows:
+        total_transactions += row['count']
+        totals[row['type']] += row['total']
+        category_counts[row['category']] = category_counts.get(row['category'], 0) + row['count']
+
+    total_income = totals['income']
+    total_expenses = totals['expense']
+
     # Most used category
-    most_used_category = Transaction.objects.filter(
-        user=user
-    ).values('category').annotate(
-        count=Count('category')
-    ).order_by('-count').first()
-    
-    return Response({
+    most_used_category = max(category_counts, key=category_counts.get) if any(category_counts.values()) else None
+
+    stats = {
         'total_transactions': total_transactions,
         'total_income': total_income,
         'total_expenses': total_expenses,
         'net_total': total_income - total_expenses,
-        'most_used_category': most_used_category['category'] if most_used_category else None,
+        'most_used_category': most_used_category,
         'average_transaction_amount': (total_income + total_expenses) / total_transactions if total_transactions > 0 else 0
-    })
\ No newline at end of file
+    }
+    cache.set(key, stats)
+    return Response(stats)
+
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the value, for streaming csv output"""
+
+    def write(self, value):
+        return value
+
+
+def _chunked(lines, size):
+    """Join an iterator of lines into blocks of ``size`` lines to avoid tiny writes"""
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_transactions(request):
+    """Stream the user's transactions as CSV or NDJSON.
+
+    Accepts the same filters as the transaction list plus ``fmt=csv|ndjson``.
+    Rows are read as tuples in chunks and written straight to the response,
+    so memory stays flat regardless of the number of transactions.
+    """
+    export_format = request.query_params.get('fmt', 'csv').lower()
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return Response(
+            {'error': 'Invalid fmt parameter, expected csv or ndjson'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # The body is read after the view returns, once the request no longer
+    # selects the user's shard, so pin the database now
+    queryset = filter_transactions(request.user, request.query_params)
+    rows = queryset.using(router.db_for_read(Transaction)).order_by('-date', '-created_at', '-id').values_list(
+        *EXPORT_FIELDS
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        lines = itertools.chain(
+            [writer.writerow(EXPORT_FIELDS)],
+            (writer.writerow(row) for row in rows),
+        )
+    else:
+        lines = (
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+            for row in rows
+        )
+
+    response = StreamingHttpResponse(
+        _chunked(lines, EXPORT_CHUNK_SIZE),
+        content_type=EXPORT_CONTENT_TYPES[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+    return response